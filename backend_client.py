@@ -0,0 +1,156 @@
+import os
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# The Angular front end loads its results from a JSON backend. The backend is
+# undocumented: the paths below are a best guess and the field names list the
+# likely candidates. Override the paths from the environment (or .env) with the
+# ones the front end actually requests.
+DEFAULT_API_URL = "https://declaratii.integritate.eu/api/"
+DEFAULT_SEARCH_PATH = "declaratii/search"
+
+# Row keys used by the scraper and the JSON fields they may come from
+FIELD_MAP = {
+    'name': ('numePrenume', 'nume', 'name'),
+    'institution': ('institutie', 'institution'),
+    'position': ('functie', 'position'),
+    'city': ('localitate', 'city'),
+    'county': ('judet', 'county'),
+    'date': ('dataDepunere', 'data', 'date'),
+    'declaration_type': ('tipDeclaratie', 'tip', 'declarationType'),
+    'download_url': ('linkDeclaratie', 'downloadUrl', 'url', 'link'),
+}
+
+
+class CloudflareChallenge(Exception):
+    """Raised when the backend answers with a Cloudflare challenge instead of data"""
+
+
+class BackendClient:
+    """Query the declarations backend directly with the browser's Cloudflare clearance"""
+
+    def __init__(self, api_url=None, search_path=None, page_size=100, timeout=30, pacer=None):
+        self.api_url = api_url or os.getenv("ANI_API_URL", DEFAULT_API_URL)
+        if not self.api_url.endswith('/'):
+            self.api_url += '/'
+        self.search_path = search_path or os.getenv("ANI_API_SEARCH_PATH", DEFAULT_SEARCH_PATH)
+        self.page_size = page_size
+        self.timeout = timeout
+        # Optional pacing.Pacer; every request waits for it and reports back
+        self.pacer = pacer
+        self.ready = False
+
+        # Pooled session so repeated searches and downloads reuse connections
+        self.session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 504),
+                        allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def sync_from_driver(self, driver):
+        """Copy cookies and user agent from the Selenium driver into the session"""
+        self.session.cookies.clear()
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(
+                cookie['name'],
+                cookie['value'],
+                domain=cookie.get('domain'),
+                path=cookie.get('path', '/'),
+            )
+        user_agent = driver.execute_script("return navigator.userAgent")
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Accept': 'application/json, text/plain, */*',
+            'Referer': driver.current_url,
+        })
+        self.ready = True
+        logger.info("Copied browser session to HTTP client")
+
+    def _check_challenge(self, response):
+        """Raise CloudflareChallenge if the response is a challenge page"""
+        if response.status_code in (403, 429, 503):
+            if (response.headers.get('cf-mitigated') == 'challenge'
+                    or 'cf-chl' in response.text
+                    or 'Just a moment' in response.text):
+                self.ready = False
+                if self.pacer is not None:
+                    self.pacer.on_challenge(response.url)
+                raise CloudflareChallenge(f"Cloudflare challenge on {response.url}")
+        response.raise_for_status()
+
+    def _get(self, url, **kwargs):
+        if self.pacer is not None:
+            self.pacer.wait(url)
+        try:
+            response = self.session.get(url, timeout=self.timeout, **kwargs)
+            self._check_challenge(response)
+        except requests.RequestException as e:
+            # A 4xx is about this request (a wrong path, a missing file), not a struggling host
+            response = getattr(e, 'response', None)
+            client_error = response is not None and 400 <= response.status_code < 500
+            if self.pacer is not None and not client_error:
+                self.pacer.on_error(url)
+            raise
+        if self.pacer is not None:
+            self.pacer.on_success(url)
+        return response
+
+    @staticmethod
+    def _to_row(record):
+        """Convert a backend record to the row layout used by extract_table_data"""
+        row_data = {}
+        for key, candidates in FIELD_MAP.items():
+            value = next((record[c] for c in candidates if record.get(c) is not None), '')
+            row_data[key] = str(value).strip()
+        row_data['has_download'] = bool(row_data['download_url'])
+        return row_data
+
+    def search(self, name, page=0):
+        """Return (rows, total) for one page of search results"""
+        params = {'lastName': name, 'page': page, 'size': self.page_size}
+        data = self._get(self.api_url + self.search_path, params=params).json()
+
+        # Accept both a bare list and a paginated envelope
+        if isinstance(data, list):
+            records, total = data, len(data)
+        else:
+            records = next((data[k] for k in ('content', 'items', 'results', 'data') if k in data), [])
+            total = next((data[k] for k in ('totalElements', 'total', 'count') if k in data), len(records))
+
+        return [self._to_row(record) for record in records], int(total)
+
+    def search_all(self, name, stop=None):
+        """Return the rows from every page of search results, or up to the page for which stop(rows) is true"""
+        rows, total = self.search(name)
+        if stop is not None and stop(rows):
+            return rows
+        page = 1
+        while len(rows) < total:
+            page_rows, _ = self.search(name, page)
+            if not page_rows:
+                break
+            rows.extend(page_rows)
+            if stop is not None and stop(page_rows):
+                break
+            page += 1
+        return rows
+
+    def download(self, url, path):
+        """Stream a PDF to path"""
+        url = requests.compat.urljoin(self.api_url, url)
+        with self._get(url, stream=True) as response:
+            content_type = response.headers.get('Content-Type', '')
+            if 'html' in content_type:
+                # An HTML body instead of a PDF means the clearance expired
+                self.ready = False
+                if self.pacer is not None:
+                    self.pacer.on_challenge(url)
+                raise CloudflareChallenge(f"Expected a PDF from {url}, got {content_type}")
+            with open(path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
@@ -0,0 +1,206 @@
+"""Benchmark DeclaratiiScraper offline against the local mock site
+
+Runs process_name over generated names and/or the whole main() flow, and
+reports names per hour, time per phase and peak memory.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import scraper
+from metrics import Metrics
+from mock_site import MockSite
+from pacing import Pacer, host_of
+
+logger = logging.getLogger(__name__)
+
+# resource only exists on POSIX systems; elsewhere the RSS peaks are left out
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SURNAMES = ["Popescu", "Ionescu", "Chirica", "Dumitru", "Stan", "Munteanu", "Dirlau", "Constantin"]
+GIVEN_NAMES = ["Mihai", "Andrei", "Ioana", "Elena", "Cosmin", "Alexandru", "Maria"]
+
+
+def make_names(count):
+    """Return count distinct 'Surname Given' names"""
+    names = []
+    for i in range(count):
+        surname = SURNAMES[i % len(SURNAMES)]
+        given = GIVEN_NAMES[(i // len(SURNAMES)) % len(GIVEN_NAMES)]
+        suffix = f" {i // (len(SURNAMES) * len(GIVEN_NAMES))}" if i >= len(SURNAMES) * len(GIVEN_NAMES) else ""
+        names.append(f"{surname} {given}{suffix}")
+    return names
+
+
+def site_options(site_url, args):
+    """Command line options that point the scraper at the mock with the benchmark's pacing"""
+    rate = args.rate
+    options = [
+        '--base-url', site_url,
+        '--pause-scale', str(args.pause_scale),
+        '--rate-limit', f"{host_of(site_url)}={rate}:{rate}:{rate}",
+        '--workers', str(args.workers),
+        '--no-excel',
+    ]
+    if args.http:
+        options.append('--http')
+    if args.batch_surnames:
+        options.append('--batch-surnames')
+    if args.lean:
+        options.append('--lean')
+    if args.pipeline:
+        options += ['--pipeline', '--download-workers', str(args.download_workers)]
+    if args.recycle_after:
+        options += ['--recycle-after', str(args.recycle_after)]
+    return options
+
+
+def bench_process_name(site_url, names, args):
+    """Time process_name for each name with a single scraper"""
+    rate = args.rate
+    pacer = Pacer({host_of(site_url): {'min_rate': rate, 'rate': rate, 'max_rate': rate}},
+                  pause_scale=args.pause_scale)
+    metrics = Metrics()
+    name_times = []
+    instance = scraper.DeclaratiiScraper(pacer=pacer, base_url=site_url, use_http=args.http, metrics=metrics,
+                                         lean=args.lean, recycle_after=args.recycle_after)
+    try:
+        start = time.perf_counter()
+        for name in names:
+            name_start = time.perf_counter()
+            instance.process_name(name)
+            name_times.append(time.perf_counter() - name_start)
+        elapsed = time.perf_counter() - start
+    finally:
+        instance.close()
+
+    summary = metrics.summary()
+    return {
+        'names': len(names),
+        'rows': len(instance.all_data),
+        'elapsed_s': round(elapsed, 3),
+        'names_per_hour': round(len(names) * 3600 / elapsed, 1),
+        'seconds_per_name': {
+            'min': round(min(name_times), 3),
+            'mean': round(sum(name_times) / len(name_times), 3),
+            'max': round(max(name_times), 3),
+        },
+        'phases': summary['phases'],
+        'events': summary['events'],
+    }
+
+
+def bench_main(site_url, names, args):
+    """Time the whole main() flow, reading names from a generated Excel file"""
+    pd.DataFrame({'Nume': names}).to_excel('benchmark_names.xlsx', index=False)
+    argv = ['benchmark_names.xlsx', '--state', 'benchmark_state.sqlite', '--output', 'benchmark_output.csv',
+            '--report', 'benchmark_report.json', '--prometheus', 'benchmark_metrics.prom'] + site_options(site_url, args)
+
+    start = time.perf_counter()
+    scraper.main(argv)
+    elapsed = time.perf_counter() - start
+
+    with open('benchmark_report.json', encoding='utf-8') as f:
+        summary = json.load(f)
+
+    rows = len(pd.read_csv('benchmark_output.csv', encoding='utf-8-sig')) if os.path.exists('benchmark_output.csv') else 0
+    return {
+        'names': len(names),
+        'rows': rows,
+        'workers': args.workers,
+        'elapsed_s': round(elapsed, 3),
+        'names_per_hour': round(len(names) * 3600 / elapsed, 1),
+        'phases': summary['phases'],
+        'events': summary['events'],
+    }
+
+
+def peak_memory():
+    """Peak Python heap from tracemalloc and peak RSS of this process and its children"""
+    _, traced_peak = tracemalloc.get_traced_memory()
+    memory = {'python_heap_peak_mb': round(traced_peak / 1024 / 1024, 1)}
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        memory['rss_peak_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+        memory['children_rss_peak_mb'] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    return memory
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against a local mock of the site")
+    parser.add_argument("--names", type=int, default=10, help="Number of names to process (default: 10)")
+    parser.add_argument("--mode", choices=("process_name", "main", "both"), default="both")
+    parser.add_argument("--workers", type=int, default=1, help="Workers for the main() run (default: 1)")
+    parser.add_argument("--http", action="store_true", help="Use the direct HTTP backend after the first search")
+    parser.add_argument("--batch-surnames", action="store_true",
+                        help="Search shared surnames once in the main() run")
+    parser.add_argument("--lean", action="store_true", help="Headless browser without images, fonts or media")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Run main() with the download pool and writer stages")
+    parser.add_argument("--download-workers", type=int, default=4, help="Download pool size with --pipeline")
+    parser.add_argument("--recycle-after", type=int, default=0, help="Restart the browser after N names")
+    parser.add_argument("--rate", type=float, default=20.0,
+                        help="Requests per second allowed against the mock (default: 20)")
+    parser.add_argument("--pause-scale", type=float, default=0.0,
+                        help="Multiplier for the human-like pauses (default: 0, no pauses)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the mock adds to every search")
+    parser.add_argument("--download-latency", type=float, default=0.0, help="Seconds the mock adds to every PDF")
+    parser.add_argument("--challenge-every", type=int, default=0,
+                        help="Answer every Nth search with a fake Cloudflare challenge (default: never)")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary working directory")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+    names = make_names(args.names)
+    site = MockSite(pdf_dir=os.path.join(repo_dir, 'downloads'), latency=args.latency,
+                    download_latency=args.download_latency, challenge_every=args.challenge_every, people=names)
+    site_url = site.start()
+
+    # Run in a scratch directory so downloads, state and output don't touch the real ones
+    work_dir = tempfile.mkdtemp(prefix='ani-benchmark-')
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    tracemalloc.start()
+    report = {'settings': vars(args), 'work_dir': work_dir}
+    try:
+        if args.mode in ('process_name', 'both'):
+            logger.info(f"Benchmarking process_name over {len(names)} names")
+            report['process_name'] = bench_process_name(site_url, names, args)
+            report['process_name']['memory'] = peak_memory()
+            tracemalloc.reset_peak()
+        if args.mode in ('main', 'both'):
+            logger.info(f"Benchmarking main() over {len(names)} names with {args.workers} workers")
+            report['main'] = bench_main(site_url, names, args)
+            report['main']['memory'] = peak_memory()
+    finally:
+        tracemalloc.stop()
+        os.chdir(previous_dir)
+        site.stop()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
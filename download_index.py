@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Row fields from extract_table_data that identify a declaration
+IDENTITY_FIELDS = ('name', 'institution', 'position', 'city', 'county', 'date', 'declaration_type')
+
+
+def number_repeats(rows, seen):
+    """Set each row's 'occurrence': how many earlier rows of the listing had the same fields"""
+    # The site can list two different declarations with identical visible fields;
+    # seen carries the counts across the pages of one search
+    for row in rows:
+        fields = tuple(str(row[field]) for field in IDENTITY_FIELDS)
+        row['occurrence'] = seen.get(fields, 0)
+        seen[fields] = row['occurrence'] + 1
+
+
+def row_identity(row):
+    """Key of a declaration: its visible fields and their occurrence in the listing"""
+    fields = '\x1f'.join(str(row[field]) for field in IDENTITY_FIELDS)
+    # Rows read back from older outputs have no occurrence
+    occurrence = str(row.get('occurrence') or 0)
+    return f"{fields}\x1f#{occurrence if occurrence.isdigit() else 0}"
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadIndex:
+    """Manifest mapping declaration identities to content hashes and files on disk"""
+
+    def __init__(self, download_dir="downloads", path=None):
+        self.download_dir = os.path.abspath(download_dir)
+        self.path = path or os.path.join(self.download_dir, "manifest.sqlite")
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                sha256 TEXT PRIMARY KEY,
+                filename TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS declarations (
+                identity TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL REFERENCES files (sha256),
+                added_at REAL NOT NULL
+            );
+        """)
+        if self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0:
+            self.index_existing_files()
+
+    @staticmethod
+    def identity(row):
+        return row_identity(row)
+
+    def index_existing_files(self):
+        """Hash PDFs already in the downloads directory so new copies are deduplicated"""
+        count = 0
+        with self.lock, self.conn:
+            for filename in sorted(os.listdir(self.download_dir)):
+                if not filename.endswith('.pdf'):
+                    continue
+                sha256 = file_sha256(os.path.join(self.download_dir, filename))
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO files (sha256, filename) VALUES (?, ?)", (sha256, filename))
+                count += cursor.rowcount
+        if count:
+            logger.info(f"Indexed {count} existing files in {self.download_dir}")
+
+    def lookup(self, row):
+        """Return the stored filename for a declaration, or None if it has to be downloaded"""
+        with self.lock:
+            found = self.conn.execute(
+                "SELECT files.filename FROM declarations JOIN files USING (sha256) "
+                "WHERE declarations.identity = ?",
+                (self.identity(row),),
+            ).fetchone()
+        if found and os.path.exists(os.path.join(self.download_dir, found[0])):
+            return found[0]
+        return None
+
+    def add(self, row, filename):
+        """Record a downloaded file and return the filename the declaration is stored under"""
+        path = os.path.join(self.download_dir, filename)
+        sha256 = file_sha256(path)
+        with self.lock, self.conn:
+            found = self.conn.execute("SELECT filename FROM files WHERE sha256 = ?", (sha256,)).fetchone()
+            # Byte-identical to a file we already have: keep the old copy only
+            if found and found[0] != filename and os.path.exists(os.path.join(self.download_dir, found[0])):
+                os.remove(path)
+                logger.info(f"{filename} is identical to {found[0]}, keeping one copy")
+                filename = found[0]
+            else:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO files (sha256, filename) VALUES (?, ?)", (sha256, filename))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO declarations (identity, sha256, added_at) VALUES (?, ?, ?)",
+                (self.identity(row), sha256, time.time()),
+            )
+        return filename
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,138 @@
+import logging
+import os
+import re
+import threading
+import time
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+# With the "allowAndName" download behavior Chrome saves each file under its GUID
+GUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+
+
+def is_download_file(filename):
+    """Return True for finished PDFs or GUID-named downloads, not partial files"""
+    return filename.endswith('.pdf') or bool(GUID_RE.match(filename))
+
+
+class DownloadTracker:
+    """Track browser downloads by GUID through Chrome DevTools download events"""
+
+    def __init__(self, driver, staging_dir):
+        self.staging_dir = staging_dir
+        self.condition = threading.Condition()
+        self.states = {}  # guid -> 'inProgress' / 'completed' / 'canceled'
+        self.unclaimed = []  # guids that began but were not yet matched to a click
+
+        driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+            "behavior": "allowAndName",
+            "downloadPath": staging_dir,
+            "eventsEnabled": True,
+        })
+        # Chrome reports downloads on the page target (Page.*) and, with
+        # eventsEnabled, on the browser target (Browser.*); listen to both
+        for domain in ("Browser", "Page"):
+            driver.add_cdp_listener(f"{domain}.downloadWillBegin", self._on_begin)
+            driver.add_cdp_listener(f"{domain}.downloadProgress", self._on_progress)
+
+    @staticmethod
+    def _params(message):
+        return message.get('params', message)
+
+    def _on_begin(self, message):
+        guid = self._params(message)['guid']
+        with self.condition:
+            if guid not in self.states:
+                self.states[guid] = 'inProgress'
+                self.unclaimed.append(guid)
+                self.condition.notify_all()
+
+    def _on_progress(self, message):
+        params = self._params(message)
+        if params.get('state') in ('completed', 'canceled'):
+            with self.condition:
+                self.states[params['guid']] = params['state']
+                self.condition.notify_all()
+
+    def wait_for_begin(self, timeout=10):
+        """Return the GUID of the next download that started, or None"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.unclaimed, timeout):
+                return None
+            return self.unclaimed.pop(0)
+
+    def wait_for_completion(self, guids, timeout=60):
+        """Wait until all downloads finish and return a dict of guid -> file path or None"""
+        deadline = time.time() + timeout
+        with self.condition:
+            self.condition.wait_for(
+                lambda: all(self.states.get(guid) != 'inProgress' for guid in guids),
+                max(0, deadline - time.time()),
+            )
+            states = {guid: self.states.pop(guid, None) for guid in guids}
+
+        paths = {}
+        for guid, state in states.items():
+            path = os.path.join(self.staging_dir, guid)
+            if state == 'completed' and os.path.exists(path):
+                paths[guid] = path
+            else:
+                logger.error(f"Download {guid} ended as {state or 'timeout'}")
+                paths[guid] = None
+        return paths
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, changed):
+        self.changed = changed
+
+    def on_any_event(self, event):
+        self.changed.set()
+
+
+class DirectoryWatcher:
+    """Detect finished downloads in a directory when DevTools events are unavailable"""
+
+    def __init__(self, directory, poll_interval=0.5):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.changed = threading.Event()
+        self.observer = None
+        if Observer is not None:
+            # Wake up on filesystem events (inotify on Linux) instead of sleeping
+            self.observer = Observer()
+            self.observer.schedule(_ChangeHandler(self.changed), directory, recursive=False)
+            self.observer.daemon = True
+            self.observer.start()
+
+    def snapshot(self):
+        return set(f for f in os.listdir(self.directory) if is_download_file(f))
+
+    def wait_for_new_file(self, before, timeout=30):
+        """Return the path of a new, fully written download, or None on timeout"""
+        deadline = time.time() + timeout
+        sizes = {}
+        while time.time() < deadline:
+            for filename in sorted(self.snapshot() - before):
+                try:
+                    size = os.path.getsize(os.path.join(self.directory, filename))
+                except OSError:
+                    continue
+                # A file is done once its size stops changing between checks
+                if size > 0 and sizes.get(filename) == size:
+                    return os.path.join(self.directory, filename)
+                sizes[filename] = size
+            self.changed.wait(self.poll_interval)
+            self.changed.clear()
+        return None
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
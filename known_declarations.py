@@ -0,0 +1,119 @@
+import glob
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from download_index import IDENTITY_FIELDS, number_repeats
+from names import name_key
+from state_store import DONE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# saved_filename of a row without a PDF; Parquet outputs read back missing values as 'None'
+NO_FILE = ('', 'N/A', 'None', 'nan')
+
+# Output files of earlier runs, looked for in the working directory when none are given
+PREVIOUS_OUTPUT_PATTERNS = (
+    'all_declarations_data*.xlsx',
+    'all_declarations_data*.csv',
+    'all_declarations_data*.parquet',
+)
+
+
+def find_previous_outputs(directory='.'):
+    """Return the output files of earlier runs in directory, oldest first"""
+    paths = set()
+    for pattern in PREVIOUS_OUTPUT_PATTERNS:
+        paths.update(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths, key=os.path.getmtime)
+
+
+def read_output(path):
+    """Load an Excel, CSV or Parquet output file as a DataFrame of strings"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path).astype(str)
+    if path.endswith('.csv'):
+        return pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    return pd.read_excel(path, dtype=str, keep_default_na=False)
+
+
+def read_declarations(path):
+    """Rows of an output file with their occurrence numbers, or None if the file can't be used"""
+    try:
+        df = read_output(path)
+    except Exception as e:
+        logger.warning(f"Could not read {path}: {str(e)}")
+        return None
+    missing = set(IDENTITY_FIELDS) - set(df.columns)
+    if missing:
+        logger.warning(f"Skipping {path}: no {', '.join(sorted(missing))} column")
+        return None
+    rows = df.to_dict('records')
+    if 'occurrence' not in df.columns:
+        # Older outputs have their rows in the order the site listed them
+        number_repeats(rows, {})
+    return rows
+
+
+class ListingOrder:
+    """Whether the search results seen so far are listed newest first"""
+
+    def __init__(self):
+        self.last = None
+        self.sorted = True
+
+    def add(self, rows):
+        for row in rows:
+            # The site groups the results per person, so a later group can start with a newer date
+            try:
+                date = datetime.strptime(str(row['date']).strip(), '%d.%m.%Y')
+            except ValueError:
+                self.sorted = False
+                continue
+            if self.last is not None and date > self.last:
+                self.sorted = False
+            self.last = date
+
+    def newest_first(self):
+        """True while the dates never went up, within one person's results or across several people's"""
+        return self.sorted
+
+
+class KnownDeclarations:
+    """Declarations handled in earlier runs, indexed per person"""
+
+    def __init__(self):
+        self.by_person = {}  # person key -> set of declaration keys
+
+    @staticmethod
+    def declaration_key(row):
+        # Spellings of the name are told apart by name_key; two declarations with the same fields by occurrence
+        fields = tuple(' '.join(str(row[field]).split()) for field in IDENTITY_FIELDS if field != 'name')
+        occurrence = str(row.get('occurrence') or 0)
+        return fields + (occurrence if occurrence.isdigit() else '0',)
+
+    def add(self, row):
+        self.by_person.setdefault(name_key(row['name']), set()).add(self.declaration_key(row))
+
+    def contains(self, row):
+        """Return True if this declaration was already handled in an earlier run"""
+        # 'CHIRICA D. MIHAI' and 'Chirica D Mihai' are the same person
+        return self.declaration_key(row) in self.by_person.get(name_key(row['name']), ())
+
+    def load(self, paths):
+        """Add the rows of earlier output files that need no more work"""
+        for path in paths:
+            rows = read_declarations(path)
+            if rows is None:
+                continue
+            # Failed downloads are tried again
+            rows = [row for row in rows if 'download_status' not in row or row['download_status'] in DONE_STATUSES]
+            for row in rows:
+                self.add(row)
+            logger.info(f"Loaded {len(rows)} known declarations from {path}")
+        logger.info(f"{len(self)} declarations of {len(self.by_person)} people known from earlier runs")
+
+    def __len__(self):
+        return sum(len(keys) for keys in self.by_person.values())
@@ -0,0 +1,136 @@
+"""Merge the outputs and downloads of several scraper runs into one dataset
+
+Each run directory is what one host produced: its all_declarations_data* files
+and its downloads/ folder. Rows are deduplicated on the declaration's identity,
+keeping the copy whose download finished; PDFs are copied into one downloads/
+folder, where byte-identical copies are kept once, and registered in its
+manifest.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+
+from download_index import DownloadIndex, file_sha256, row_identity
+from known_declarations import NO_FILE, find_previous_outputs, read_declarations
+from output_sink import OutputSink, FORMATS, timestamped_path
+from state_store import DONE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+def has_file(row, download_dir):
+    """True if the row's download finished and its PDF is in download_dir"""
+    # A failed row keeps the name its file would have had, which another declaration's file may use
+    if row.get('download_status') not in DONE_STATUSES:
+        return False
+    filename = row.get('saved_filename', '')
+    return filename not in NO_FILE and os.path.isfile(os.path.join(download_dir, filename))
+
+
+def collect_rows(run_dirs):
+    """Return one row per declaration in the runs, with the downloads folder it came from"""
+    best = {}  # identity -> (rank, row, download dir)
+    read = 0
+    for run_dir in run_dirs:
+        download_dir = os.path.join(run_dir, 'downloads')
+        for path in find_previous_outputs(run_dir):
+            rows = read_declarations(path)
+            if rows is None:
+                continue
+            mtime = os.path.getmtime(path)
+            for row in rows:
+                # Parquet and CSV outputs read back the flag as text
+                row['has_download'] = str(row.get('has_download')).lower() == 'true'
+                # A finished download with its PDF beats a failed one, and a newer output beats an older one
+                rank = (row.get('download_status') in DONE_STATUSES, has_file(row, download_dir), mtime)
+                # Declarations sharing one byte-identical PDF stay separate rows
+                key = row_identity(row)
+                if key not in best or rank > best[key][0]:
+                    best[key] = (rank, row, download_dir)
+                read += 1
+            logger.info(f"Read {len(rows)} rows from {path}")
+
+    logger.info(f"{read} rows read, {len(best)} distinct declarations")
+    return [(row, download_dir) for _, row, download_dir in best.values()]
+
+
+def copy_download(source, target_dir, filename):
+    """Copy a PDF into target_dir and return its name there; a different file with the same name gets a suffix"""
+    base_name, extension = os.path.splitext(filename)
+    target = os.path.join(target_dir, filename)
+    counter = 1
+    while os.path.exists(target):
+        if os.path.getsize(target) == os.path.getsize(source) and file_sha256(target) == file_sha256(source):
+            return os.path.basename(target)
+        target = os.path.join(target_dir, f"{base_name}_{counter}{extension}")
+        counter += 1
+    shutil.copy2(source, target)
+    return os.path.basename(target)
+
+
+def merge_runs(run_dirs, target_dir='.', fmt='csv'):
+    """Write one deduplicated output and downloads folder for the runs into target_dir; returns the output path"""
+    target_downloads = os.path.join(target_dir, 'downloads')
+    os.makedirs(target_downloads, exist_ok=True)
+    download_index = DownloadIndex(target_downloads)
+    output_path = timestamped_path(os.path.join(target_dir, f"all_declarations_data.{fmt}"))
+    output = OutputSink(output_path, fmt)
+
+    copied = set()
+    try:
+        for row, download_dir in collect_rows(run_dirs):
+            if has_file(row, download_dir):
+                source = os.path.join(download_dir, row['saved_filename'])
+                filename = copy_download(source, target_downloads, row['saved_filename'])
+                # Byte-identical copies from different hosts end up as one file
+                row['saved_filename'] = download_index.add(row, filename)
+                copied.add(os.path.realpath(source))
+            output.append(row)
+
+        # PDFs no row points to, e.g. from runs whose output was lost, are kept too
+        extra = 0
+        for run_dir in run_dirs:
+            download_dir = os.path.join(run_dir, 'downloads')
+            if not os.path.isdir(download_dir):
+                continue
+            for filename in sorted(os.listdir(download_dir)):
+                source = os.path.join(download_dir, filename)
+                target = os.path.join(target_downloads, filename)
+                # A name that is already there is the same declaration, downloaded by another host
+                if filename.endswith('.pdf') and os.path.realpath(source) not in copied and not os.path.exists(target):
+                    shutil.copy2(source, target)
+                    extra += 1
+        logger.info(f"{len(copied)} linked and {extra} other PDFs merged into {target_downloads}")
+    finally:
+        output.close()
+        download_index.close()
+    return output_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the outputs and downloads of several scraper runs")
+    parser.add_argument("run_dirs", nargs="+",
+                        help="Directories of the runs, each with its all_declarations_data* files and downloads/")
+    parser.add_argument("--into", default=".",
+                        help="Directory the merged output and downloads/ are written to (default: current directory)")
+    parser.add_argument("--format", choices=FORMATS, default="csv",
+                        help="Format of the merged output (default: csv)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    missing = [run_dir for run_dir in args.run_dirs if not os.path.isdir(run_dir)]
+    if missing:
+        logger.error(f"Not a directory: {', '.join(missing)}")
+        return 1
+    output_path = merge_runs(args.run_dirs, args.into, args.format)
+    logger.info(f"Merged output written to {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
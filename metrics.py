@@ -0,0 +1,159 @@
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Durations kept per phase for percentiles; count, sum and max stay exact
+RESERVOIR_SIZE = 10000
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class PhaseStats:
+    """Running statistics for one phase"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        # Reservoir sampling keeps memory bounded on long runs
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(duration)
+        else:
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = duration
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """Timing spans and event counters for a run, shared by all workers"""
+
+    def __init__(self, trace_path=None):
+        self.lock = threading.Lock()
+        self.phases = defaultdict(PhaseStats)
+        self.events = defaultdict(int)  # (event, phase) -> count
+        self.local = threading.local()
+        self.started = time.time()
+        # Optional JSON-lines file with every span and its tags
+        self.trace = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+
+    def current_tags(self):
+        return getattr(self.local, 'tags', {})
+
+    def set_tags(self, **tags):
+        """Tag the following spans of this thread, e.g. with the name and page number"""
+        self.local.tags = dict(self.current_tags(), **tags)
+
+    def clear_tags(self):
+        self.local.tags = {}
+
+    @contextmanager
+    def span(self, phase, **tags):
+        """Time the enclosed block as one span of phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.phases[phase].add(duration)
+                if self.trace is not None:
+                    record = dict(self.current_tags(), **tags)
+                    record.update(phase=phase, duration_s=round(duration, 4), at=round(time.time(), 3))
+                    self.trace.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def count(self, event, phase):
+        """Count an event such as 'timeout' or 'retry' for a phase"""
+        with self.lock:
+            self.events[(event, phase)] += 1
+
+    def summary(self):
+        """Return the report as a dict"""
+        with self.lock:
+            phases = {
+                phase: {
+                    'count': stats.count,
+                    'total_s': round(stats.total, 3),
+                    'mean_s': round(stats.total / stats.count, 3) if stats.count else 0.0,
+                    'max_s': round(stats.max, 3),
+                    **{f"p{int(q * 100)}_s": round(stats.quantile(q), 3) for q in QUANTILES},
+                }
+                for phase, stats in sorted(self.phases.items(), key=lambda item: -item[1].total)
+            }
+            events = defaultdict(dict)
+            for (event, phase), count in sorted(self.events.items()):
+                events[event][phase] = count
+        return {
+            'started': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            'elapsed_s': round(time.time() - self.started, 3),
+            'phases': phases,
+            'events': dict(events),
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+        logger.info(f"Run report saved to {path}")
+
+    def write_prometheus(self, path):
+        """Write the metrics in the Prometheus textfile collector format"""
+        lines = [
+            "# HELP ani_phase_duration_seconds Time spent in each scraper phase.",
+            "# TYPE ani_phase_duration_seconds summary",
+        ]
+        with self.lock:
+            for phase, stats in sorted(self.phases.items()):
+                for q in QUANTILES:
+                    lines.append(f'ani_phase_duration_seconds{{phase="{phase}",quantile="{q}"}} {stats.quantile(q):.6f}')
+                lines.append(f'ani_phase_duration_seconds_sum{{phase="{phase}"}} {stats.total:.6f}')
+                lines.append(f'ani_phase_duration_seconds_count{{phase="{phase}"}} {stats.count}')
+            lines += [
+                "# HELP ani_events_total Time-outs, retries and other events per phase.",
+                "# TYPE ani_events_total counter",
+            ]
+            for (event, phase), count in sorted(self.events.items()):
+                lines.append(f'ani_events_total{{event="{event}",phase="{phase}"}} {count}')
+        lines += [
+            "# HELP ani_run_elapsed_seconds Wall time of the run so far.",
+            "# TYPE ani_run_elapsed_seconds gauge",
+            f"ani_run_elapsed_seconds {time.time() - self.started:.3f}",
+        ]
+
+        # Write and rename so the collector never reads a half-written file
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(path + '.tmp', path)
+        logger.info(f"Prometheus metrics saved to {path}")
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+
+
+def timed(phase):
+    """Decorator that records a method call as a span of self.metrics"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.span(phase):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
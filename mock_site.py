@@ -0,0 +1,291 @@
+"""Local stand-in for declaratii.integritate.eu, used by benchmark.py
+
+Serves a search form, a Material-style results table built from mat-row /
+mat-cell elements with a paginator, the JSON search API used by the HTTP
+client, PDF downloads taken from downloads/, and an optional fake Cloudflare
+challenge.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+INSTITUTIONS = [
+    "Primaria Municipiului Iasi",
+    "Consiliul Judetean Cluj",
+    "Ministerul Finantelor",
+    "Spitalul Judetean de Urgenta Brasov",
+    "Agentia Nationala de Administrare Fiscala",
+]
+POSITIONS = ["Consilier", "Director", "Inspector", "Sef serviciu", "Medic"]
+PLACES = [("Iasi", "Iasi"), ("Cluj-Napoca", "Cluj"), ("Bucuresti", "Bucuresti"), ("Brasov", "Brasov")]
+DECLARATION_TYPES = ["Declaraţie de avere", "Declaraţie de interese"]
+PAGE_SIZES = (10, 25, 50)
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Declaratii - mock</title></head>
+<body>
+<input id="ssidLastName" class="form-control" type="text" maxlength="60" style="width: 600px">
+<button type="button" class="btn btn-success">Cautare</button>
+<div id="results"></div>
+<script>
+var PAGE_SIZES = %(page_sizes)s;
+var FIELDS = ['numePrenume', 'institutie', 'functie', 'localitate', 'judet', 'dataDepunere', 'tipDeclaratie'];
+var state = {name: '', page: 0, size: PAGE_SIZES[0]};
+
+function el(tag, className, text) {
+    var node = document.createElement(tag);
+    if (className) { node.className = className; }
+    if (text !== undefined) { node.textContent = text; }
+    return node;
+}
+
+function load() {
+    var url = '/api/declaratii/search?lastName=' + encodeURIComponent(state.name) +
+              '&page=' + state.page + '&size=' + state.size;
+    fetch(url).then(function (response) {
+        if (response.status === 403) {
+            location.href = '/challenge?next=' + encodeURIComponent('/?q=' + state.name);
+            throw new Error('challenge');
+        }
+        return response.json();
+    }).then(render);
+}
+
+function render(data) {
+    var results = document.getElementById('results');
+    results.innerHTML = '';
+    // Built with DOM calls so the mat-row elements stay inside the table
+    var table = el('table', 'mat-mdc-table');
+    data.content.forEach(function (record) {
+        var row = el('mat-row');
+        FIELDS.forEach(function (field) { row.appendChild(el('mat-cell', '', record[field])); });
+        var last = el('mat-cell');
+        if (record.linkDeclaratie) {
+            var button = el('button', 'mdc-button', 'Descarca');
+            button.onclick = function () { location.href = record.linkDeclaratie; };
+            last.appendChild(button);
+        }
+        row.appendChild(last);
+        table.appendChild(row);
+    });
+    results.appendChild(table);
+
+    var paginator = el('mat-paginator');
+    var select = el('mat-select', '', String(state.size));
+    select.onclick = function () {
+        var overlay = el('div', 'cdk-overlay-pane');
+        PAGE_SIZES.forEach(function (size) {
+            var option = el('mat-option', '', String(size));
+            option.setAttribute('aria-selected', size === state.size ? 'true' : 'false');
+            option.onclick = function () {
+                overlay.remove();
+                if (size !== state.size) { state.size = size; state.page = 0; load(); }
+            };
+            overlay.appendChild(option);
+        });
+        document.body.appendChild(overlay);
+    };
+    paginator.appendChild(select);
+    var next = el('button', 'mat-mdc-paginator-navigation-next', '>');
+    next.disabled = (state.page + 1) * state.size >= data.totalElements;
+    next.onclick = function () { state.page += 1; load(); };
+    paginator.appendChild(next);
+    results.appendChild(paginator);
+}
+
+document.querySelector('button.btn-success').onclick = function () {
+    state.name = document.getElementById('ssidLastName').value;
+    state.page = 0;
+    load();
+};
+
+var query = new URLSearchParams(location.search).get('q');
+if (query) {
+    document.getElementById('ssidLastName').value = query;
+    state.name = query;
+    load();
+}
+</script>
+</body>
+</html>
+"""
+
+CHALLENGE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Just a moment...</title>
+<meta http-equiv="refresh" content="%(delay)s;url=%(next)s"></head>
+<body>Checking your browser before accessing the site (cf-chl mock).</body></html>
+"""
+
+
+def declarations_for(name):
+    """Return the fake declaration records for a searched name, the same on every call"""
+    rng = random.Random(hashlib.sha256(name.lower().encode('utf-8')).hexdigest())
+    token = hashlib.sha256(name.lower().encode('utf-8')).hexdigest()[:12]
+    records = []
+    for idx in range(rng.randint(1, 30)):
+        city, county = rng.choice(PLACES)
+        records.append({
+            'numePrenume': name.upper(),
+            'institutie': rng.choice(INSTITUTIONS),
+            'functie': rng.choice(POSITIONS),
+            'localitate': city,
+            'judet': county,
+            'dataDepunere': f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(2022, 2024)}",
+            'tipDeclaratie': DECLARATION_TYPES[idx % 2],
+            # About one declaration in ten has no file
+            'linkDeclaratie': f"/download/{token}/{idx}" if rng.random() > 0.1 else '',
+        })
+    # Like the site, list the newest declarations first
+    records.sort(key=lambda record: record['dataDepunere'].split('.')[::-1], reverse=True)
+    return records
+
+
+class MockSite:
+    """Threaded HTTP server imitating the declarations site"""
+
+    def __init__(self, host='127.0.0.1', port=0, pdf_dir='downloads', latency=0.0,
+                 download_latency=0.0, challenge_every=0, challenge_delay=2, people=None):
+        self.latency = latency
+        # With people, a search returns the declarations of every person whose name contains
+        # all the searched words, so a surname search finds the whole family
+        self.people = list(people or [])
+        self.download_latency = download_latency
+        self.challenge_every = challenge_every
+        self.challenge_delay = challenge_delay
+        self.api_calls = 0
+        self.lock = threading.Lock()
+
+        pdf_dir = os.path.abspath(pdf_dir)
+        self.pdfs = [os.path.join(pdf_dir, f) for f in sorted(os.listdir(pdf_dir)) if f.endswith('.pdf')]
+        if not self.pdfs:
+            raise ValueError(f"No sample PDFs found in {pdf_dir}")
+        self.pdf_cache = {}
+
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.handle(self)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-site", daemon=True)
+        self.thread.start()
+        logger.info(f"Mock site running at {self.url}")
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def pdf_bytes(self, token, idx):
+        """Return a sample PDF made unique for this declaration"""
+        path = self.pdfs[(int(token, 16) + idx) % len(self.pdfs)]
+        if path not in self.pdf_cache:
+            with open(path, 'rb') as f:
+                self.pdf_cache[path] = f.read()
+        # A trailing comment keeps the file valid and its hash distinct
+        return self.pdf_cache[path] + f"\n%mock {token}/{idx}\n".encode('ascii')
+
+    def search(self, query):
+        """Return the declaration records matching a search"""
+        if not self.people:
+            return declarations_for(query)
+        words = query.lower().split()
+        records = []
+        for person in self.people:
+            if all(word in person.lower().split() for word in words):
+                records.extend(declarations_for(person))
+        return records
+
+    def handle(self, request):
+        parsed = urllib.parse.urlsplit(request.path)
+        params = urllib.parse.parse_qs(parsed.query)
+
+        if parsed.path == '/':
+            page = INDEX_HTML % {'page_sizes': json.dumps(list(PAGE_SIZES))}
+            self.send(request, 200, page.encode('utf-8'), 'text/html; charset=utf-8')
+
+        elif parsed.path == '/challenge':
+            next_url = params.get('next', ['/'])[0]
+            page = CHALLENGE_HTML % {'delay': self.challenge_delay, 'next': next_url}
+            self.send(request, 200, page.encode('utf-8'), 'text/html; charset=utf-8')
+
+        elif parsed.path == '/api/declaratii/search':
+            time.sleep(self.latency)
+            with self.lock:
+                self.api_calls += 1
+                challenge = self.challenge_every and self.api_calls % self.challenge_every == 0
+            if challenge:
+                body = b"<html><title>Just a moment...</title>cf-chl</html>"
+                self.send(request, 403, body, 'text/html', {'cf-mitigated': 'challenge'})
+                return
+            records = self.search(params.get('lastName', [''])[0])
+            page = int(params.get('page', ['0'])[0])
+            size = int(params.get('size', [str(PAGE_SIZES[0])])[0])
+            data = {'content': records[page * size:(page + 1) * size], 'totalElements': len(records)}
+            self.send(request, 200, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+        elif parsed.path.startswith('/download/'):
+            time.sleep(self.download_latency)
+            _, _, token, idx = parsed.path.split('/')
+            headers = {'Content-Disposition': 'attachment; filename="declaratie.pdf"'}
+            self.send(request, 200, self.pdf_bytes(token, int(idx)), 'application/pdf', headers)
+
+        else:
+            self.send(request, 404, b"Not found", 'text/plain')
+
+    @staticmethod
+    def send(request, status, body, content_type, headers=None):
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the declarations site")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every search response")
+    parser.add_argument("--download-latency", type=float, default=0.0, help="Seconds added to every PDF download")
+    parser.add_argument("--challenge-every", type=int, default=0,
+                        help="Answer every Nth search with a fake Cloudflare challenge (default: never)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    site = MockSite(port=args.port, latency=args.latency, download_latency=args.download_latency,
+                    challenge_every=args.challenge_every)
+    site.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
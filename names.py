@@ -0,0 +1,25 @@
+import re
+import unicodedata
+
+
+def clean_name(name):
+    """Remove dashes and repeated spaces from a name as typed in the Excel file"""
+    return ' '.join(str(name).replace('-', ' ').split())
+
+
+def name_parts(name):
+    """Lower-case words of a name without diacritics or punctuation, for comparing names"""
+    decomposed = unicodedata.normalize('NFKD', str(name))
+    plain = ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    return re.findall(r'\w+', plain)
+
+
+def name_key(name):
+    """Key under which spellings of the same name compare equal"""
+    return ' '.join(name_parts(name))
+
+
+def name_matches(row_name, name):
+    """Return True if every part of a requested name appears in a declarant's name"""
+    row_parts = set(name_parts(row_name))
+    return all(part in row_parts for part in name_parts(name))
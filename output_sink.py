@@ -0,0 +1,120 @@
+import csv
+import logging
+import os
+import threading
+import time
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Column order of the output file
+OUTPUT_COLUMNS = (
+    'name', 'institution', 'position', 'city', 'county', 'date', 'declaration_type',
+    'has_download', 'saved_filename', 'download_status', 'searched_name', 'occurrence',
+)
+
+FORMATS = ('csv', 'parquet')
+
+
+def timestamped_path(path):
+    """Return path, or path with a timestamp added if it already exists"""
+    if not os.path.exists(path):
+        return path
+    base, extension = os.path.splitext(path)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    return f"{base}_{timestamp}{extension}"
+
+
+class OutputSink:
+    """Append declaration rows to a CSV file or Parquet dataset in batches"""
+
+    def __init__(self, path, fmt='csv', batch_size=50, columns=OUTPUT_COLUMNS, on_write=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format '{fmt}', expected one of {', '.join(FORMATS)}")
+        self.path = path
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.columns = tuple(columns)
+        # Called with each batch once it is on disk, e.g. to checkpoint its rows
+        self.on_write = on_write
+        self.buffer = []
+        self.count = 0
+        self.lock = threading.Lock()
+
+        if fmt == 'csv':
+            new_file = not os.path.exists(path)
+            # utf-8-sig so Excel shows diacritics; no BOM when appending to a resumed file
+            self.file = open(path, 'a', newline='', encoding='utf-8-sig' if new_file else 'utf-8')
+            self.writer = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction='ignore')
+            if new_file:
+                self.writer.writeheader()
+                self.file.flush()
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+            self.pa, self.pq = pa, pq
+            self.schema = pa.schema(
+                [(column, pa.bool_() if column == 'has_download' else pa.string()) for column in self.columns]
+            )
+            # Each batch is a separate part file, so the dataset can be read while the run goes on
+            os.makedirs(path, exist_ok=True)
+            self.part = len([f for f in os.listdir(path) if f.endswith('.parquet')])
+
+    def append(self, row_dict):
+        """Queue a row; a full batch is written out immediately"""
+        with self.lock:
+            self.buffer.append(row_dict)
+            if len(self.buffer) >= self.batch_size:
+                self._write_batch()
+
+    def flush(self):
+        """Write out any queued rows"""
+        with self.lock:
+            self._write_batch()
+
+    def _write_batch(self):
+        if not self.buffer:
+            return
+        if self.fmt == 'csv':
+            self.writer.writerows(self.buffer)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        else:
+            columns = {
+                column: [self._parquet_value(row.get(column), column) for row in self.buffer]
+                for column in self.columns
+            }
+            table = self.pa.Table.from_pydict(columns, schema=self.schema)
+            part_name = f"part-{self.part:05d}.parquet"
+            # Write under a hidden temporary name so readers never see a half-written part
+            temp_path = os.path.join(self.path, f".{part_name}.tmp")
+            self.pq.write_table(table, temp_path)
+            os.replace(temp_path, os.path.join(self.path, part_name))
+            self.part += 1
+        if self.on_write is not None:
+            self.on_write(self.buffer)
+        self.count += len(self.buffer)
+        self.buffer = []
+
+    @staticmethod
+    def _parquet_value(value, column):
+        if value is None:
+            return None
+        if column == 'has_download':
+            return bool(value)
+        return str(value)
+
+    def read_dataframe(self):
+        """Load everything written so far as a DataFrame"""
+        if self.fmt == 'csv':
+            return pd.read_csv(self.path, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+        return pd.read_parquet(self.path)
+
+    def close(self):
+        self.flush()
+        if self.fmt == 'csv':
+            self.file.close()
+        logger.info(f"{self.count} rows written to {self.path}")
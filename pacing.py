@@ -0,0 +1,159 @@
+import logging
+import random
+import threading
+import time
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+# Default limits in requests per second, used for hosts without their own settings
+DEFAULT_LIMITS = {
+    'rate': 0.2,       # starting rate: one request every 5 s
+    'min_rate': 0.02,  # never slower than one request every 50 s
+    'max_rate': 1.0,   # never faster than one request per second
+}
+
+# AIMD parameters
+INCREASE_STEP = 0.02    # requests/s added after each clean response
+CHALLENGE_FACTOR = 0.3  # rate multiplier when a Cloudflare challenge appears
+ERROR_FACTOR = 0.7      # rate multiplier after an error
+
+
+def host_of(url):
+    """Return the host part of a URL (or the value itself if it is already a host)"""
+    return urllib.parse.urlsplit(url).hostname or url
+
+
+class TokenBucket:
+    """Token bucket whose refill rate follows additive-increase/multiplicative-decrease"""
+
+    def __init__(self, host, rate, min_rate, max_rate):
+        self.host = host
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.start_rate = self.rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        # Statistics for the achieved rate
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.challenges = 0
+        self.errors = 0
+
+    def _refill(self, now):
+        # At most one token is kept, so there are no bursts after an idle period
+        self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request to the host is allowed"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.count += 1
+                    self.first = self.first or now
+                    self.last = now
+                    return
+                wait = (1 - self.tokens) / self.rate
+            # A little jitter so several workers don't fire in lockstep
+            time.sleep(wait * random.uniform(1.0, 1.25))
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + INCREASE_STEP)
+
+    def on_challenge(self):
+        with self.lock:
+            self.challenges += 1
+            self.rate = max(self.min_rate, self.rate * CHALLENGE_FACTOR)
+            # Drop any saved token so the next request really waits
+            self.tokens = 0.0
+            logger.warning(f"Backing off {self.host}: {self.rate:.3f} requests/s")
+
+    def on_error(self):
+        with self.lock:
+            self.errors += 1
+            self.rate = max(self.min_rate, self.rate * ERROR_FACTOR)
+
+    def slowdown(self):
+        """Return how much slower than its starting rate the host currently is"""
+        with self.lock:
+            return self.start_rate / self.rate
+
+    def achieved_rate(self):
+        with self.lock:
+            if self.count < 2:
+                return 0.0
+            return (self.count - 1) / (self.last - self.first)
+
+
+class Pacer:
+    """Central pacing for all requests, shared by every worker"""
+
+    def __init__(self, host_limits=None, pause_scale=1.0):
+        # host -> dict with any of 'rate', 'min_rate', 'max_rate'
+        self.host_limits = host_limits or {}
+        # Multiplier for client-side pauses; 0 disables them (e.g. against a local mock)
+        self.pause_scale = pause_scale
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url):
+        host = host_of(url)
+        with self.lock:
+            if host not in self.buckets:
+                limits = dict(DEFAULT_LIMITS, **self.host_limits.get(host, {}))
+                self.buckets[host] = TokenBucket(host, limits['rate'], limits['min_rate'], limits['max_rate'])
+            return self.buckets[host]
+
+    def wait(self, url):
+        """Wait for permission to send a request to the host of url"""
+        self.bucket(url).acquire()
+
+    def pause(self, url, low, high):
+        """Sleep for a client-side delay scaled by how healthy the host is"""
+        # Healthy hosts shrink the delay down to a quarter; backed-off hosts stretch it
+        scale = min(max(self.bucket(url).slowdown(), 0.25), 4.0) * self.pause_scale
+        if scale > 0:
+            time.sleep(random.uniform(low, high) * scale)
+
+    def on_success(self, url):
+        self.bucket(url).on_success()
+
+    def on_challenge(self, url):
+        self.bucket(url).on_challenge()
+
+    def on_error(self, url):
+        self.bucket(url).on_error()
+
+    def report(self):
+        """Log the achieved request rate for every host"""
+        with self.lock:
+            buckets = list(self.buckets.values())
+        for bucket in buckets:
+            logger.info(
+                f"{bucket.host}: {bucket.count} requests, {bucket.achieved_rate():.3f} requests/s achieved, "
+                f"limit now {bucket.rate:.3f}/s, {bucket.challenges} challenges, {bucket.errors} errors"
+            )
+
+
+def parse_host_limits(values):
+    """Parse HOST=MAX_RATE or HOST=MIN:START:MAX command line values"""
+    host_limits = {}
+    for value in values or []:
+        host, _, rates = value.partition('=')
+        parts = [float(part) for part in rates.split(':')]
+        if len(parts) == 1:
+            limits = {'max_rate': parts[0], 'rate': min(DEFAULT_LIMITS['rate'], parts[0])}
+        elif len(parts) == 3:
+            limits = {'min_rate': parts[0], 'rate': parts[1], 'max_rate': parts[2]}
+        else:
+            raise ValueError(f"Invalid rate limit '{value}', expected HOST=MAX or HOST=MIN:START:MAX")
+        host_limits[host] = limits
+    return host_limits
@@ -0,0 +1,464 @@
+"""Parse downloaded declaration PDFs into structured records
+
+Every table row of a declaration becomes one record tagged with its section
+(land, buildings, vehicles, bank accounts, debts, incomes, board memberships
+and so on). PDFs are parsed in a process pool and the records are cached by
+file hash, so a PDF is never parsed twice; a new or deleted output is filled
+from the cache.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from download_index import file_sha256
+from output_sink import FORMATS, OutputSink
+
+logger = logging.getLogger(__name__)
+
+# Column order of the parsed output; the row's cells are kept as JSON in 'fields'
+PARSED_COLUMNS = (
+    'source_file', 'sha256', 'declaration_id', 'declaration_type', 'declarant', 'position', 'institution',
+    'category', 'section', 'group', 'row', 'fields',
+)
+
+# Section headings, matched against the start of a line with diacritics removed
+# (declaration type, pattern, section, category); a None section ends the tables
+SECTIONS = [
+    ('avere', r'1\.\s*terenuri', 'land', 'assets'),
+    ('avere', r'2\.\s*cladiri', 'buildings', 'assets'),
+    ('avere', r'1\.\s*autovehicule', 'vehicles', 'assets'),
+    ('avere', r'2\.\s*bunuri sub forma de metale', 'valuables', 'assets'),
+    ('avere', r'iii\.\s*bunuri mobile', 'disposed_assets', 'assets'),
+    ('avere', r'1\.\s*conturi', 'bank_accounts', 'assets'),
+    ('avere', r'2\.\s*plasamente', 'investments', 'assets'),
+    ('avere', r'3\.\s*alte active', 'other_assets', 'assets'),
+    ('avere', r'v\.\s*datorii', 'debts', 'debts'),
+    ('avere', r'vi\.\s*cadouri', 'gifts', 'gifts'),
+    ('avere', r'vii\.\s*venituri', 'incomes', 'incomes'),
+    ('interese', r'1\.\s*asociat sau actionar', 'shareholdings', 'interests'),
+    ('interese', r'2\.\s*calitatea de membru in organele de conducere', 'board_memberships', 'board_memberships'),
+    ('interese', r'3\.\s*calitatea de membru in cadrul asociatiilor', 'professional_associations', 'interests'),
+    ('interese', r'4\.\s*calitatea de membru in organele de conducere', 'party_positions', 'interests'),
+    ('interese', r'5\.\s*contracte', 'contracts', 'interests'),
+    (None, r'prezenta declaratie constituie act public', None, None),
+    (None, r'data completarii', None, None),
+]
+
+# "1. Venituri din salarii" or "1.1. Titular" rows that label the rows below them
+GROUP_RE = re.compile(r'^(\d+)\.(\d+\.?)?\s*(.+)$')
+DECLARANT_RE = re.compile(
+    r'Subsemnat(?:ul|a)\s+(?P<declarant>.+?),\s+av[âa]nd\s+func[tţț]ia\s+de\s+(?P<position>.+?)\s+la\s+'
+    r'(?P<institution>.+?),\s+CNP'
+)
+
+
+def normalize(text):
+    """Lower-case text without diacritics, for matching headings"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+def clean_cell(value):
+    # Cells wrap over several lines; keep hyphenated words together
+    return re.sub(r'\s+', ' ', (value or '').replace('-\n', '-')).strip()
+
+
+def clean_header(value):
+    # Drop numbering such as '5.1' and footnote markers such as 'Titularul1)' or 'Categoria*'
+    value = re.sub(r'^\d+(\.\d+)*\.?\s+', '', clean_cell(value))
+    return re.sub(r'(\d\)|\*)+$', '', value).strip()
+
+
+def match_section(text, declaration_type):
+    """Return (section, category) if text starts a section of this declaration type, else None"""
+    text = normalize(text)
+    for doc_type, pattern, section, category in SECTIONS:
+        if doc_type in (declaration_type, None) and re.match(pattern, text):
+            return section, category
+    return None
+
+
+def declaration_info(text, path):
+    """Declaration id, type, declarant, position and institution from the first page"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    info = {'declaration_id': lines[0] if lines and lines[0].isdigit() else ''}
+
+    title = normalize(' '.join(lines[:3]))
+    if 'declaratie de avere' in title:
+        info['declaration_type'] = 'avere'
+    elif 'declaratie de interese' in title:
+        info['declaration_type'] = 'interese'
+    else:
+        name = normalize(os.path.basename(path))
+        info['declaration_type'] = 'avere' if 'avere' in name else 'interese' if 'interese' in name else ''
+
+    match = DECLARANT_RE.search(' '.join(lines))
+    for field in ('declarant', 'position', 'institution'):
+        info[field] = match.group(field).strip() if match else ''
+    return info
+
+
+def outer_tables(tables):
+    """Drop tables that pdfplumber also finds nested inside the cells of another table"""
+    def inside(inner, outer):
+        return (inner.bbox[0] >= outer.bbox[0] and inner.bbox[1] >= outer.bbox[1]
+                and inner.bbox[2] <= outer.bbox[2] and inner.bbox[3] <= outer.bbox[3])
+    return [t for t in tables if not any(o is not t and inside(t, o) for o in tables)]
+
+
+class DeclarationParser:
+    """Walks the pages of one declaration and turns its tables into records"""
+
+    def __init__(self, declaration_type):
+        self.declaration_type = declaration_type
+        self.section = None
+        self.category = None
+        self.header = None
+        self.header_open = False  # the header was the last row before a page break
+        self.groups = {}
+        self.records = []
+
+    def on_line(self, text):
+        found = match_section(text, self.declaration_type)
+        if found and found[0] != self.section:
+            self.section, self.category = found
+            self.header = None
+            self.header_open = False
+            self.groups = {}
+
+    def on_table(self, rows):
+        for index, row in enumerate(rows):
+            cells = [clean_cell(cell) for cell in row]
+            if not any(cells):
+                continue
+            # Declarations of interests repeat the section heading in the first row of the table
+            if match_section(cells[0], self.declaration_type) and not any(cells[1:]):
+                self.on_line(cells[0])
+                continue
+            if self.section is None:
+                continue
+            if all(cell in ('', '-') for cell in cells):
+                continue
+
+            if self.header is None:
+                if len(cells) == 1:
+                    self.header = ['item']
+                else:
+                    self.header = [clean_header(cell) or f"column_{i + 1}" for i, cell in enumerate(row)]
+                    self.header_open = index == len(rows) - 1
+                    continue
+            if self.header_open and index == 0 and len(cells) == len(self.header) and '-' not in cells:
+                # The header cells carried over to this page
+                self.header = [f"{head} {cell}".strip() for head, cell in zip(self.header, cells)]
+                self.header_open = False
+                continue
+            self.header_open = False
+            if [clean_header(cell) for cell in row] == self.header:
+                continue  # header repeated on a new page
+
+            if len(cells) > 1 and not any(cells[1:]):
+                group = GROUP_RE.match(cells[0])
+                if index == 0 and not group and self.records and self.records[-1]['section'] == self.section:
+                    # The first cell of the previous row carried over to this page
+                    self.continue_record(cells[0])
+                elif group:
+                    # Level 1 ('1. Venituri din salarii') resets level 2 ('1.1. Titular')
+                    self.set_group(2 if group.group(2) else 1, group.group(3))
+                else:
+                    # Unnumbered holder labels such as 'Titular' or 'Soţ/soţie'
+                    self.set_group(2, re.sub(r'^\d\)\s*', '', cells[0]))
+                continue
+
+            self.add_record(cells)
+
+    def set_group(self, level, label):
+        self.groups = {k: v for k, v in self.groups.items() if k < level}
+        self.groups[level] = label.strip()
+
+    def add_record(self, cells):
+        header = self.header
+        if len(header) != len(cells):
+            header = [f"column_{i + 1}" for i in range(len(cells))]
+        self.records.append({
+            'category': self.category,
+            'section': self.section,
+            'group': ' / '.join(self.groups[level] for level in sorted(self.groups)),
+            'fields': dict(zip(header, cells)),
+        })
+
+    def continue_record(self, text):
+        fields = self.records[-1]['fields']
+        first = next(iter(fields))
+        fields[first] = f"{fields[first]} {text}".strip()
+
+
+def parse_pdf(path):
+    """Parse one PDF; runs in a worker process and returns (records, error)"""
+    try:
+        import pdfplumber
+    except ImportError:
+        raise ImportError("Parsing PDFs needs pdfplumber: pip install pdfplumber")
+
+    try:
+        with pdfplumber.open(path) as pdf:
+            parser = None
+            info = {}
+            for page in pdf.pages:
+                if parser is None:
+                    info = declaration_info(page.extract_text() or '', path)
+                    parser = DeclarationParser(info['declaration_type'])
+
+                # Headings and tables in reading order, so each table lands in the section above it
+                events = [(line['top'], 0, line['text']) for line in page.extract_text_lines()]
+                events += [(table.bbox[1], 1, table) for table in outer_tables(page.find_tables())]
+                for _, kind, item in sorted(events, key=lambda event: (event[0], event[1])):
+                    if kind == 0:
+                        parser.on_line(item)
+                    else:
+                        parser.on_table(item.extract())
+                page.close()
+    except Exception as e:
+        return [], str(e)
+
+    records = []
+    for number, record in enumerate(parser.records if parser else [], start=1):
+        records.append(dict(
+            info,
+            source_file=os.path.basename(path),
+            category=record['category'],
+            section=record['section'],
+            group=record['group'],
+            row=str(number),
+            fields=json.dumps(record['fields'], ensure_ascii=False),
+        ))
+    return records, None
+
+
+class ParseCache:
+    """SQLite record of which file hashes have been parsed, their records, and the outputs they went to"""
+
+    def __init__(self, path="parse_cache.sqlite"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                filename TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                sha256 TEXT
+            );
+            CREATE TABLE IF NOT EXISTS parsed (
+                sha256 TEXT PRIMARY KEY,
+                filename TEXT,
+                records INTEGER,
+                error TEXT,
+                parsed_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS records (
+                sha256 TEXT,
+                number INTEGER,
+                data TEXT,
+                PRIMARY KEY (sha256, number)
+            );
+            CREATE TABLE IF NOT EXISTS written (
+                output TEXT,
+                sha256 TEXT,
+                PRIMARY KEY (output, sha256)
+            );
+        """)
+        if 'parsed' in tables and 'records' not in tables:
+            # Older caches kept no records, so they can't be written to another output
+            if self.conn.execute("DELETE FROM parsed").rowcount:
+                logger.warning(f"{path} has no stored records; every PDF is parsed again, "
+                               "so start a new output to avoid duplicate rows")
+        self.conn.commit()
+
+    def file_hash(self, path):
+        """Hash of the file, re-read only when its size or modification time changed"""
+        stat = os.stat(path)
+        filename = os.path.basename(path)
+        row = self.conn.execute(
+            "SELECT sha256 FROM files WHERE filename = ? AND size = ? AND mtime = ?",
+            (filename, stat.st_size, stat.st_mtime),
+        ).fetchone()
+        if row:
+            return row[0]
+        sha256 = file_sha256(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (filename, size, mtime, sha256) VALUES (?, ?, ?, ?)",
+            (filename, stat.st_size, stat.st_mtime, sha256),
+        )
+        self.conn.commit()
+        return sha256
+
+    def is_parsed(self, sha256, retry_failed=False):
+        row = self.conn.execute("SELECT error FROM parsed WHERE sha256 = ?", (sha256,)).fetchone()
+        return row is not None and not (retry_failed and row[0])
+
+    def is_written(self, sha256, output):
+        row = self.conn.execute(
+            "SELECT 1 FROM written WHERE output = ? AND sha256 = ?", (output, sha256),
+        ).fetchone()
+        return row is not None
+
+    def records(self, sha256):
+        """Records parsed from the file with this hash, in their original order"""
+        return [
+            json.loads(data) for data, in self.conn.execute(
+                "SELECT data FROM records WHERE sha256 = ? ORDER BY number", (sha256,),
+            )
+        ]
+
+    def mark_parsed(self, results, output):
+        """Store (sha256, filename, records, error) tuples whose records were written to output"""
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+        for sha256, filename, records, error in results:
+            self.conn.execute("DELETE FROM records WHERE sha256 = ?", (sha256,))
+            self.conn.executemany(
+                "INSERT INTO records (sha256, number, data) VALUES (?, ?, ?)",
+                [(sha256, number, json.dumps(record, ensure_ascii=False)) for number, record in enumerate(records)],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO parsed (sha256, filename, records, error, parsed_at) VALUES (?, ?, ?, ?, ?)",
+                (sha256, filename, len(records), error, now),
+            )
+        self.mark_written([sha256 for sha256, _, _, _ in results], output)
+
+    def mark_written(self, hashes, output):
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO written (output, sha256) VALUES (?, ?)", [(output, sha256) for sha256 in hashes],
+        )
+        self.conn.commit()
+
+    def forget_output(self, output):
+        """Forget what was written to an output that is gone, so it is written again in full"""
+        self.conn.execute("DELETE FROM written WHERE output = ?", (output,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def pending_files(download_dir, cache, output, retry_failed=False):
+    """PDFs in download_dir still to parse, as (path, sha256), and hashes parsed but not yet written to output"""
+    pending = {}
+    cached = []
+    for filename in sorted(os.listdir(download_dir)):
+        path = os.path.join(download_dir, filename)
+        if not filename.lower().endswith('.pdf') or not os.path.isfile(path):
+            continue
+        try:
+            sha256 = cache.file_hash(path)
+        except OSError as e:
+            logger.warning(f"Could not read {filename}: {str(e)}")
+            continue
+        # Byte-identical copies are parsed once
+        if sha256 in pending or sha256 in cached:
+            continue
+        if not cache.is_parsed(sha256, retry_failed):
+            pending[sha256] = path
+        elif not cache.is_written(sha256, output):
+            cached.append(sha256)
+    return [(path, sha256) for sha256, path in pending.items()], cached
+
+
+def parse_all(download_dir, sink, cache, workers=None, retry_failed=False, commit_every=50):
+    """Parse every new PDF in download_dir into sink; returns the number of PDFs parsed or taken from the cache"""
+    output = os.path.abspath(sink.path)
+    pending, cached = pending_files(download_dir, cache, output, retry_failed)
+
+    # PDFs parsed for another output, or before this one was deleted, are not parsed again
+    if cached:
+        logger.info(f"Writing the cached records of {len(cached)} PDFs to {sink.path}")
+    for start in range(0, len(cached), commit_every):
+        hashes = cached[start:start + commit_every]
+        for sha256 in hashes:
+            for record in cache.records(sha256):
+                sink.append(record)
+        sink.flush()
+        cache.mark_written(hashes, output)
+
+    if not pending:
+        return len(cached)
+    logger.info(f"Parsing {len(pending)} PDFs with {workers or os.cpu_count()} processes")
+
+    done = []
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(parse_pdf, path): (path, sha256) for path, sha256 in pending}
+        for count, future in enumerate(as_completed(futures), start=1):
+            path, sha256 = futures[future]
+            records, error = future.result()
+            if error:
+                failed += 1
+                logger.warning(f"Could not parse {os.path.basename(path)}: {error}")
+            for record in records:
+                record['sha256'] = sha256
+                sink.append(record)
+            done.append((sha256, os.path.basename(path), records, error))
+
+            # Only mark PDFs as parsed once their records are on disk
+            if len(done) >= commit_every or count == len(futures):
+                sink.flush()
+                cache.mark_parsed(done, output)
+                done = []
+                logger.info(f"Parsed {count}/{len(futures)} PDFs")
+
+    if failed:
+        logger.warning(f"{failed} PDFs could not be parsed")
+    return len(pending) + len(cached)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Parse downloaded declaration PDFs into structured records")
+    parser.add_argument("download_dir", nargs="?", default="downloads",
+                        help="Directory with the downloaded PDFs (default: downloads)")
+    parser.add_argument("--output", default=None,
+                        help="Records output; new records are appended "
+                             "(default: parsed_declarations.csv or parsed_declarations.parquet)")
+    parser.add_argument("--format", choices=FORMATS, default="csv",
+                        help="Output format: csv file or parquet dataset directory (default: csv)")
+    parser.add_argument("--cache", default="parse_cache.sqlite",
+                        help="SQLite file with the records of the parsed PDFs (default: parse_cache.sqlite)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parser processes (default: one per CPU core)")
+    parser.add_argument("--retry-failed", action="store_true", help="Parse again PDFs that failed before")
+    parser.add_argument("--watch", type=float, default=0, metavar="SECONDS",
+                        help="Keep running and parse new downloads every SECONDS, e.g. alongside a scraping run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    output_path = args.output or f"parsed_declarations.{args.format}"
+    cache = ParseCache(args.cache)
+    if not os.path.exists(output_path):
+        cache.forget_output(os.path.abspath(output_path))
+    sink = OutputSink(output_path, args.format, batch_size=500, columns=PARSED_COLUMNS)
+
+    try:
+        while True:
+            parsed = parse_all(args.download_dir, sink, cache, args.workers, args.retry_failed)
+            if not args.watch:
+                if not parsed:
+                    logger.info("No new PDFs to parse")
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        logger.info("Parsing interrupted")
+    finally:
+        sink.close()
+        cache.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import logging
+import queue
+import threading
+
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Pipeline:
+    """Download pool and row writer fed by the listing workers through bounded queues"""
+
+    def __init__(self, output=None, state=None, metrics=None, download_workers=4, download_queue_size=20,
+                 write_queue_size=500, work_queue=None):
+        self.output = output
+        self.state = state
+        self.work_queue = work_queue
+        self.metrics = metrics or Metrics()
+        self.all_data = []  # rows, when there is no output sink
+        # A full queue blocks the stage that feeds it, so a slow stage holds the others back
+        # instead of letting work pile up in memory
+        self.download_queue = queue.Queue(maxsize=download_queue_size)
+        self.write_queue = queue.Queue(maxsize=write_queue_size)
+
+        # Searches, keyed by their tuple of names, whose rows are still on the way to the writer
+        self.condition = threading.Condition()
+        self.pending = {}  # names -> rows not written yet
+        self.listed = {}  # names -> success, once the listing worker is done with them
+        self.failed = set()  # names with a row that could not be downloaded or written
+
+        self.downloaders = [
+            threading.Thread(target=self._download_loop, name=f"download-{i + 1}", daemon=True)
+            for i in range(max(1, download_workers))
+        ]
+        self.writer = threading.Thread(target=self._write_loop, name="writer", daemon=True)
+        for thread in self.downloaders + [self.writer]:
+            thread.start()
+
+    def _add_pending(self, names):
+        with self.condition:
+            self.pending[names] = self.pending.get(names, 0) + 1
+
+    def submit_download(self, names, job):
+        """Queue a download; job() runs in the pool and returns the finished row"""
+        names = tuple(names)
+        self._add_pending(names)
+        with self.metrics.span('download_queue_wait'):
+            self.download_queue.put((names, job))
+
+    def submit_row(self, names, row_dict):
+        """Queue a row for the writer"""
+        names = tuple(names)
+        self._add_pending(names)
+        with self.metrics.span('write_queue_wait'):
+            self.write_queue.put((names, row_dict))
+
+    def finish_search(self, names, success):
+        """Called by a listing worker when a search is listed; the names are marked once their rows are saved"""
+        names = tuple(names)
+        with self.condition:
+            self.listed[names] = success
+        self._complete_if_done(names)
+
+    def _row_done(self, names, ok=True):
+        with self.condition:
+            self.pending[names] -= 1
+            if not ok:
+                self.failed.add(names)
+        self._complete_if_done(names)
+
+    def _complete_if_done(self, names):
+        with self.condition:
+            if self.pending.get(names, 0) or names not in self.listed:
+                return
+            success = self.listed.pop(names) and names not in self.failed
+            self.pending.pop(names, None)
+            self.failed.discard(names)
+
+        # Make the rows of these names readable before they count as done
+        if self.output is not None:
+            self.output.flush()
+        if self.state is not None:
+            for name in names:
+                self.state.mark_name(name, 'done' if success else 'failed')
+        if self.work_queue is not None:
+            self.work_queue.complete(names, success)
+
+    def _download_loop(self):
+        while True:
+            item = self.download_queue.get()
+            if item is None:
+                break
+            names, job = item
+            try:
+                with self.metrics.span('download_job'):
+                    row_dict = job()
+            except Exception as e:
+                logger.error(f"Download job failed: {str(e)}")
+                self.metrics.count('error', 'download_job')
+                self._row_done(names, ok=False)
+                continue
+            with self.metrics.span('write_queue_wait'):
+                self.write_queue.put((names, row_dict))
+
+    def _write_loop(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            names, row_dict = item
+            try:
+                # An output sink checkpoints its rows itself once they are on disk
+                if self.output is not None:
+                    self.output.append(row_dict)
+                else:
+                    self.all_data.append(row_dict)
+                    if self.state is not None:
+                        self.state.record_row(row_dict)
+            except Exception as e:
+                logger.error(f"Could not save row: {str(e)}")
+                self.metrics.count('error', 'write_row')
+                self._row_done(names, ok=False)
+                continue
+            self._row_done(names)
+
+    def close(self):
+        """Let the queued downloads and rows drain, then stop the stages"""
+        for _ in self.downloaders:
+            self.download_queue.put(None)
+        for thread in self.downloaders:
+            thread.join()
+        self.write_queue.put(None)
+        self.writer.join()
+        if self.pending:
+            logger.warning(f"{len(self.pending)} searches still had rows in flight when the pipeline stopped")
@@ -1,28 +1,289 @@
 import os
-import random
 import time
 import logging
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import pandas as pd
 import requests
 from dotenv import load_dotenv
 import urllib.parse
 import sys
+import argparse
+import functools
+import queue
+import subprocess
+import threading
+from backend_client import BackendClient, CloudflareChallenge
+from state_store import StateStore
+from download_index import DownloadIndex, number_repeats
+from download_watcher import DownloadTracker, DirectoryWatcher
+from pacing import Pacer, host_of, parse_host_limits
+from output_sink import OutputSink, timestamped_path, FORMATS
+from metrics import Metrics, timed
+from pipeline import Pipeline
+from names import clean_name, name_key, name_matches
+from known_declarations import KnownDeclarations, ListingOrder, find_previous_outputs, read_output
+from work_queue import WorkQueue
+from merge_runs import merge_runs
+
+load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
+BASE_URL = "https://declaratii.integritate.eu/"
+
+# Use lxml for offline HTML when it is installed; it is much faster than html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# psutil is in requirements.txt; without it the browser's memory can only be read from /proc on Linux
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Selectors for the search form, most specific first
+SEARCH_INPUT_SELECTORS = [
+    (By.ID, "ssidLastName"),  # Primary selector - exact ID match
+    (By.CSS_SELECTOR, "input.form-control[type='text']"),  # Class and type match
+    (By.CSS_SELECTOR, "input[style*='width: 600px']"),  # Style attribute match
+    (By.CSS_SELECTOR, "input[type='text'][maxlength='60']"),  # Type and maxlength match
+    (By.CSS_SELECTOR, "input[type='text']"),  # Generic text input fallback
+]
+SUBMIT_BUTTON_SELECTORS = [
+    (By.CSS_SELECTOR, "button.btn.btn-success"),
+    (By.CSS_SELECTOR, "button[class*='btn-success']"),
+    (By.XPATH, "//button[contains(text(), 'Cautare')]"),
+    (By.XPATH, "//button[contains(@class, 'btn-success')]"),
+    (By.CSS_SELECTOR, "button[type='button']"),
+    (By.CSS_SELECTOR, "button.btn"),
+]
+
+# Requests the lean mode blocks through DevTools: images, fonts, media and analytics
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.ogg',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*hotjar.com*',
+]
+LEAN_WINDOW_SIZE = '1280,900'
+
+# Consecutive HTTP backend failures, other than challenges, after which the run sticks to the browser
+HTTP_FAILURE_LIMIT = 3
+
+# Columns of the results table, in order; the 8th cell holds the download button
+TABLE_COLUMNS = ('name', 'institution', 'position', 'city', 'county', 'date', 'declaration_type')
+
+# Reads only the result rows in the browser and returns them as compact JSON,
+# with each row's own download button as a WebElement
+TABLE_ROWS_SCRIPT = """
+return Array.from(document.querySelectorAll('mat-row')).map(function (row) {
+    var cells = row.querySelectorAll('mat-cell');
+    var button = cells.length > 7 ? cells[7].querySelector('button') : null;
+    return {
+        cells: Array.from(cells).map(function (cell) { return cell.textContent.trim(); }),
+        has_download: button !== null,
+        button: button
+    };
+}).filter(function (row) { return row.cells.length > 0; });
+"""
+
+# undetected-chromedriver patches a shared chromedriver binary on startup, so
+# drivers must be created one at a time when several workers are running
+_driver_start_lock = threading.Lock()
+# Workers share the final downloads directory, so picking a free filename and
+# renaming into it must not interleave
+_rename_lock = threading.Lock()
+
+
+def table_rows_to_records(rows):
+    """Turn [{'cells': [...], 'has_download': bool, 'button': element}] into declaration records"""
+    records = []
+    for row in rows:
+        row_data = dict(zip(TABLE_COLUMNS, row['cells']))
+        row_data['has_download'] = bool(row['has_download'])
+        if row.get('button') is not None:
+            row_data['button'] = row['button']
+        records.append(row_data)
+    return records
+
+
+def parse_table_html(html):
+    """Extract declaration records from saved results page HTML"""
+    # Only build the tree for the result rows
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=SoupStrainer('mat-row'))
+    rows = []
+    for row in soup.find_all('mat-row'):
+        cells = row.find_all('mat-cell')
+        if cells:
+            rows.append({
+                'cells': [cell.get_text().strip() for cell in cells],
+                'has_download': len(cells) > 7 and cells[7].find('button') is not None,
+            })
+    return table_rows_to_records(rows)
+
+
+def get_names_from_excel(excel_file):
+    """Read names from all sheets in the Excel file, without duplicates"""
+    try:
+        # Parse the workbook once; sheet_name=None returns every sheet
+        sheets = pd.read_excel(excel_file, sheet_name=None)
+        all_names = []
+        seen = set()
+        duplicates = 0
+
+        for sheet_name, df in sheets.items():
+            logger.info(f"Reading sheet: {sheet_name}")
+
+            # Check if 'Nume' column exists
+            if 'Nume' not in df.columns:
+                logger.warning(f"No 'Nume' column found in sheet {sheet_name}")
+                continue
+
+            # Get names, remove dashes and clean up
+            for name in df['Nume'].dropna():
+                name = clean_name(name)
+                key = name_key(name)
+                if not key:
+                    continue
+                # Names that differ only in case or diacritics are searched once
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                all_names.append(name)
+
+        logger.info(f"Found {len(all_names)} names across all sheets ({duplicates} duplicates skipped)")
+        return all_names
+
+    except Exception as e:
+        logger.error(f"Error reading Excel file: {str(e)}")
+        return []
+
+
+def group_by_surname(names):
+    """Group names by their first word into (search term, names) pairs"""
+    groups = {}
+    for name in names:
+        surname = name.split()[0]
+        groups.setdefault(name_key(surname), (surname, []))[1].append(name)
+    # A shared surname is searched once for all its names; a lone name is searched in full
+    return [(surname, group) if len(group) > 1 else (group[0], group) for surname, group in groups.values()]
+
+
+def browser_rss_mb(pid):
+    """Resident memory in MB of a browser process and all its children, or None if unknown"""
+    if not pid:
+        return None
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            return sum(p.memory_info().rss for p in [process] + process.children(recursive=True)) / 1024 / 1024
+        except psutil.Error:
+            return None
+
+    # Linux without psutil: find the children through /proc
+    children = {}
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name is in parentheses and may contain spaces
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total_kb = 0
+    found = False
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        found = True
+        except OSError:
+            continue
+    return total_kb / 1024 if found else None
+
+
 class DeclaratiiScraper:
-    def __init__(self):
-        self.base_url = "https://declaratii.integritate.eu/"
+    def __init__(self, download_dir="downloads", staging_dir=None, profile_dir=None, use_http=False, state=None,
+                 download_index=None, max_downloads=3, pacer=None, output=None, keep_session=True,
+                 base_url=BASE_URL, metrics=None, lean=False, recycle_after=0, max_browser_mb=0, pipeline=None,
+                 known=None, work_queue=None):
+        self.base_url = base_url
+        # Timing spans and time-out/retry counters, shared by all workers when given
+        self.metrics = metrics or Metrics()
+        # Shared pacing for every request to the site
+        self.pacer = pacer or Pacer()
+        # Final location of renamed PDFs
+        self.download_dir = os.path.abspath(download_dir)
+        # Directory Chrome saves into; separate per worker so downloads don't mix
+        self.staging_dir = os.path.abspath(staging_dir) if staging_dir else self.download_dir
+        # Chrome user profile; None lets undetected-chromedriver use a temporary one
+        self.profile_dir = os.path.abspath(profile_dir) if profile_dir else None
+        os.makedirs(self.download_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        # Session mode: keep the search page open between names and only reload when needed
+        self.keep_session = keep_session
+        self.session_loaded = False
+        self.form_selectors = None  # (input selector, button selector) that worked last
+        self.page_size_set = False
+        # Number of downloads from one results page allowed in flight at once
+        self.max_downloads = max(1, max_downloads)
+        # Fallback completion detection when DevTools download events are unavailable
+        self.download_watcher = DirectoryWatcher(self.staging_dir)
+        self.download_tracker = None
+        # Lean mode: headless while Cloudflare allows it, a smaller window and no images, fonts, media or analytics
+        self.lean = lean
+        self.headless = lean
+        # Restart the browser after this many names or once it uses this much memory (0 = never)
+        self.recycle_after = recycle_after
+        self.max_browser_mb = max_browser_mb
+        self.names_since_start = 0
         self.setup_driver()
         self.all_data = []  # List to store all table data
+        # Optional OutputSink shared by all workers; when set, rows are streamed
+        # there instead of being kept in all_data, and its on_write records them in the state
+        self.output = output
+        # Direct HTTP client, filled with the browser's clearance after the first search
+        if use_http:
+            # A site other than the default (a mirror or local mock) serves its API next to the pages
+            api_url = None if base_url == BASE_URL else urllib.parse.urljoin(base_url, "api/")
+            self.backend = BackendClient(api_url=api_url, pacer=self.pacer)
+        else:
+            self.backend = None
+        self.http_failures = 0
+        # Optional StateStore shared by all workers; rows are saved there as they are handled
+        self.state = state
+        # Optional DownloadIndex used to skip declarations that are already on disk
+        self.download_index = download_index
+        # Optional KnownDeclarations from earlier runs; known rows are skipped and can end the pagination
+        self.known = known
+        # Optional Pipeline shared by all workers; when set, downloads are finished in its pool
+        # and rows are saved by its writer, so this browser moves on to the next page at once
+        self.pipeline = pipeline
+        # Optional WorkQueue shared with other hosts; a search's lease is finished once its names are marked
+        self.work_queue = work_queue
+        self.current_names = []
+        self.downloads_in_flight = 0
+        self.downloads_done = threading.Condition()
         
     def setup_driver(self):
         """Set up the undetected Chrome WebDriver with appropriate options"""
@@ -36,97 +297,265 @@ class DeclaratiiScraper:
             
             # Set download preferences
             prefs = {
-                "download.default_directory": os.path.abspath("downloads"),
+                "download.default_directory": self.staging_dir,
                 "download.prompt_for_download": False,
                 "download.directory_upgrade": True,
                 "safebrowsing.enabled": True
             }
             options.add_experimental_option("prefs", prefs)
             
+            if self.lean:
+                options.add_argument(f'--window-size={LEAN_WINDOW_SIZE}')
+            
             # Create undetected-chromedriver instance
-            self.driver = uc.Chrome(options=options)
-            self.driver.maximize_window()
+            with _driver_start_lock:
+                self.driver = uc.Chrome(options=options, user_data_dir=self.profile_dir, enable_cdp_events=True,
+                                        headless=self.headless)
+            if self.lean:
+                self.block_resources()
+            else:
+                self.driver.maximize_window()
+            
+            # Track downloads by GUID through DevTools events when possible
+            try:
+                self.download_tracker = DownloadTracker(self.driver, self.staging_dir)
+            except Exception as e:
+                logger.warning(f"DevTools download events unavailable, watching the directory instead: {str(e)}")
+                self.download_tracker = None
             
         except Exception as e:
             logger.error(f"Error setting up Chrome driver: {str(e)}")
             logger.error("Please make sure Chrome is installed and up to date.")
             raise
 
+    def block_resources(self):
+        """Stop the browser from loading images, fonts, media and analytics"""
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            logger.warning(f"Could not block resources through DevTools: {str(e)}")
+
+    def restart_driver(self):
+        """Replace the browser with a fresh one; progress is kept in the state and output"""
+        self.wait_for_downloads()
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing the browser: {str(e)}")
+        self.session_loaded = False
+        self.page_size_set = False
+        self.names_since_start = 0
+        with self.metrics.span('restart_driver'):
+            self.setup_driver()
+        self.metrics.count('restart', 'driver')
+
+    def recycle_if_due(self):
+        """Restart the browser after recycle_after names or once it grows past max_browser_mb"""
+        reason = None
+        if self.recycle_after and self.names_since_start >= self.recycle_after:
+            reason = f"after {self.names_since_start} names"
+        elif self.max_browser_mb:
+            rss = browser_rss_mb(getattr(self.driver, 'browser_pid', None))
+            if rss is not None and rss > self.max_browser_mb:
+                reason = f"at {rss:.0f} MB"
+        if reason:
+            logger.info(f"Recycling the browser {reason}")
+            self.restart_driver()
+
     def get_names_from_excel(self, excel_file):
         """Read names from all sheets in the Excel file"""
-        try:
-            # Read all sheets
-            excel = pd.ExcelFile(excel_file)
-            all_names = []
-            
-            for sheet_name in excel.sheet_names:
-                logger.info(f"Reading sheet: {sheet_name}")
-                df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                
-                # Check if 'Nume' column exists
-                if 'Nume' not in df.columns:
-                    logger.warning(f"No 'Nume' column found in sheet {sheet_name}")
-                    continue
-                
-                # Get names, remove dashes and clean up
-                names = df['Nume'].dropna().tolist()
-                cleaned_names = [name.replace('-', ' ').strip() for name in names]
-                all_names.extend(cleaned_names)
+        return get_names_from_excel(excel_file)
+
+    def make_filename(self, row):
+        """Build the PDF filename for a declaration row"""
+        filename = f"{row['name'].replace(' ', '_')}_{row['date'].replace('.', '-')}_{row['declaration_type'].replace(' ', '_')}.pdf"
+        return urllib.parse.unquote(filename)  # Handle special characters
+
+    def move_to_downloads(self, downloaded_file, filename):
+        """Move a finished download into the downloads directory under a free name"""
+        # Handle duplicate filenames
+        base_name = os.path.splitext(filename)[0]
+        extension = os.path.splitext(filename)[1]
+        counter = 1
+        
+        with _rename_lock:
+            new_path = os.path.join(self.download_dir, filename)
             
-            logger.info(f"Found {len(all_names)} names across all sheets")
-            return all_names
+            # If file exists, add a number to the filename
+            while os.path.exists(new_path):
+                new_path = os.path.join(self.download_dir, f"{base_name}_{counter}{extension}")
+                counter += 1
             
-        except Exception as e:
-            logger.error(f"Error reading Excel file: {str(e)}")
-            return []
+            os.replace(downloaded_file, new_path)
+        return os.path.basename(new_path)
+
+    def record_row(self, row_dict):
+        """Keep a processed row and checkpoint it"""
+        if self.pipeline is not None:
+            self.pipeline.submit_row(self.current_names, row_dict)
+            return
+        if self.output is not None:
+            # The sink checkpoints the row once it is on disk, so a crash can't leave it only in the state
+            self.output.append(row_dict)
+            return
+        self.all_data.append(row_dict)
+        if self.state is not None:
+            self.state.record_row(row_dict)
+
+    def row_already_done(self, row):
+        """Return True if a resumed run already handled this declaration"""
+        if self.state is not None and self.state.is_row_done(row):
+            logger.info(f"Skipping {row['name']} on {row['date']} - already done in a previous run")
+            return True
+        return False
+
+    def is_known(self, row):
+        """Return True if an earlier run already handled this declaration"""
+        return self.known is not None and self.known.contains(row)
+
+    def nothing_new(self, rows, names, order):
+        """Return True if a page has declarations from earlier runs and none new for names, in a listing sorted newest first"""
+        order.add(rows)
+        if self.known is None or not order.newest_first():
+            return False
+        ours = [row for row in rows if self.searched_names(row, names)]
+        known = [row for row in ours if self.is_known(row)]
+        return bool(known) and len(known) == len(ours)
+
+    def existing_download(self, row, row_dict):
+        """Fill row_dict from the download index and return True if the file is already on disk"""
+        if self.download_index is None:
+            return False
+        existing = self.download_index.lookup(row)
+        if existing is None:
+            return False
+        logger.info(f"Already downloaded as {existing}")
+        row_dict['saved_filename'] = existing
+        row_dict['download_status'] = 'Already downloaded'
+        return True
 
-    def process_name(self, name):
+    def index_download(self, row, final_filename):
+        """Add a finished download to the index and return the filename it is kept under"""
+        if self.download_index is None:
+            return final_filename
+        return self.download_index.add(row, final_filename)
+
+    def process_name(self, name, names=None):
         """Process a single name and download its declarations"""
+        # With names, name is a shared surname searched once and only the rows of names are kept
+        names = names or [name]
+        self.current_names = names
+        if self.state is not None:
+            for requested in names:
+                self.state.mark_name(requested, 'in_progress')
+        self.metrics.set_tags(name=name, page=1)
+        with self.metrics.span('process_name'):
+            success = self._process_name(name, names)
+        self.metrics.clear_tags()
+        if not success:
+            self.metrics.count('error', 'process_name')
+        if self.pipeline is not None:
+            # The writer marks the names once their last row is saved
+            self.pipeline.finish_search(names, success)
+        else:
+            # Make this name's rows readable before moving on
+            if self.output is not None:
+                self.output.flush()
+            if self.state is not None:
+                for requested in names:
+                    self.state.mark_name(requested, 'done' if success else 'failed')
+            if self.work_queue is not None:
+                self.work_queue.complete(names, success)
+        # The names are checkpointed, so the browser can be replaced now
+        self.names_since_start += len(names)
+        self.recycle_if_due()
+
+    def searched_names(self, row, names):
+        """Return the requested names a result row belongs to, joined with '; '"""
+        if len(names) == 1:
+            return names[0]
+        return '; '.join(requested for requested in names if name_matches(row['name'], requested))
+
+    def http_enabled(self):
+        """Return True if names may go through the HTTP backend"""
+        return self.backend is not None and self.http_failures < HTTP_FAILURE_LIMIT
+
+    def _process_name(self, name, names):
+        if self.http_enabled() and self.backend.ready:
+            try:
+                self.process_name_http(name, names)
+                self.http_failures = 0
+                return True
+            except CloudflareChallenge as e:
+                logger.warning(f"{str(e)} - falling back to the browser")
+                self.metrics.count('retry', 'http_fallback')
+            except (requests.RequestException, ValueError) as e:
+                # The next browser search refreshes the session before the backend is tried again
+                self.backend.ready = False
+                self.http_failures += 1
+                self.metrics.count('retry', 'http_fallback')
+                if self.http_failures >= HTTP_FAILURE_LIMIT:
+                    logger.warning(f"HTTP backend failed for {name}: {str(e)} - "
+                                   f"{self.http_failures} failures in a row, using the browser from now on")
+                else:
+                    logger.warning(f"HTTP backend failed for {name}: {str(e)} - falling back to the browser")
+
         try:
             logger.info(f"\nProcessing name: {name}")
             results = self.search_person(name)
             
-            if results is not None and not results.empty:
+            if results:
                 logger.info(f"Found {len(results)} declarations for {name}")
                 
                 # Process all pages
+                page = 1
+                seen = {}
+                order = ListingOrder()
                 while True:
-                    # Get all download buttons on current page
-                    download_buttons = self.driver.find_elements(By.CSS_SELECTOR, "button.mdc-button")
+                    number_repeats(results, seen)
                     
                     # Process current page
-                    for idx, row in results.iterrows():
-                        if row['has_download'] and idx < len(download_buttons):
+                    pending = []
+                    for row in results:
+                        # The button comes from inside the row, so a row without one can't shift the others
+                        button = row.pop('button', None)
+                        searched = self.searched_names(row, names)
+                        if not searched:
+                            continue  # another person with the same surname
+                        row = dict(row, searched_name=searched)
+                        if self.is_known(row) or self.row_already_done(row):
+                            continue
+                        if row['has_download'] and button is not None:
                             # Create filename
-                            filename = f"{row['name'].replace(' ', '_')}_{row['date'].replace('.', '-')}_{row['declaration_type'].replace(' ', '_')}.pdf"
-                            filename = urllib.parse.unquote(filename)  # Handle special characters
+                            filename = self.make_filename(row)
                             
                             # Add filename to row data
-                            row_dict = row.to_dict()
+                            row_dict = dict(row)
                             row_dict['saved_filename'] = filename
                             
-                            # Download the file
-                            success, final_filename = self.download_file_from_button(download_buttons[idx], filename)
-                            if success:
-                                logger.info(f"Downloaded to {final_filename}")
-                                row_dict['download_status'] = 'Success'
-                                row_dict['saved_filename'] = final_filename  # Update with final filename
-                            else:
-                                logger.error(f"Failed to download {filename}")
-                                row_dict['download_status'] = 'Failed'
+                            # Skip the click entirely if this declaration is already on disk
+                            if self.existing_download(row, row_dict):
+                                self.record_row(row_dict)
+                                continue
                             
-                            # Add to all_data
-                            self.all_data.append(row_dict)
-                            
-                            # Wait between downloads
-                            self.random_delay()
+                            pending.append((row, row_dict, button, filename))
                         else:
                             logger.warning(f"No download button for {row['name']} on {row['date']}")
                             # Add to all_data even if no download button
-                            row_dict = row.to_dict()
+                            row_dict = dict(row)
                             row_dict['saved_filename'] = 'N/A'
                             row_dict['download_status'] = 'No download button'
-                            self.all_data.append(row_dict)
+                            self.record_row(row_dict)
+                    
+                    # Download the files of this page
+                    self.download_rows(pending)
+                    
+                    # Older pages hold nothing new once the listing is known to be sorted newest first
+                    if self.nothing_new(results, names, order):
+                        logger.info("No new declarations on this page - skipping the older pages")
+                        self.metrics.count('early_stop', 'pagination')
+                        break
                     
                     # Check for next page button
                     try:
@@ -136,15 +565,18 @@ class DeclaratiiScraper:
                             break
                             
                         # Click next page
+                        self.wait_for_turn()
                         next_page_button.click()
                         logger.info("Moving to next page")
+                        page += 1
+                        self.metrics.set_tags(page=page)
                         
                         # Wait for the new page to load
-                        time.sleep(random.uniform(3, 5))
+                        self.random_delay(1, 3)
                         
                         # Get new results
                         results = self.extract_table_data()
-                        if results is None or results.empty:
+                        if not results:
                             logger.info("No more results found")
                             break
                             
@@ -154,19 +586,239 @@ class DeclaratiiScraper:
                         
             else:
                 logger.warning(f"No declarations found for {name}")
+            return True
                 
         except Exception as e:
             logger.error(f"Error processing name {name}: {str(e)}")
+            self.pacer.on_error(self.base_url)
+            self.session_loaded = False
             # Take a screenshot for debugging
             try:
                 self.driver.save_screenshot(f"error_{name.replace(' ', '_')}.png")
                 logger.info(f"Error screenshot saved as 'error_{name.replace(' ', '_')}.png'")
             except:
                 pass
+            return False
+
+    def download_rows(self, pending):
+        """Download the files for a page of rows and record the rows"""
+        if not pending:
+            return
+
+        if self.pipeline is not None:
+            self.queue_downloads(pending)
+            return
+
+        if self.download_tracker is not None:
+            results = self.download_concurrently([(button, filename) for _, _, button, filename in pending])
+        else:
+            results = []
+            for _, _, button, filename in pending:
+                results.append(self.download_file_from_button(button, filename))
+
+        for (row, row_dict, _, filename), (success, final_filename) in zip(pending, results):
+            # Add to all_data
+            self.record_row(self.download_result(row, row_dict, filename, success, final_filename))
+
+    def download_result(self, row, row_dict, filename, success, final_filename):
+        """Fill in the download status of a row and return it"""
+        if success:
+            final_filename = self.index_download(row, final_filename)
+            logger.info(f"Downloaded to {final_filename}")
+            row_dict['download_status'] = 'Success'
+            row_dict['saved_filename'] = final_filename  # Update with final filename
+        else:
+            logger.error(f"Failed to download {filename}")
+            row_dict['download_status'] = 'Failed'
+        return row_dict
+
+    def submit_download(self, job):
+        """Hand a download to the pipeline's pool, keeping count of this browser's downloads"""
+        with self.downloads_done:
+            self.downloads_in_flight += 1
+
+        def run():
+            try:
+                return job()
+            finally:
+                with self.downloads_done:
+                    self.downloads_in_flight -= 1
+                    self.downloads_done.notify_all()
+
+        self.pipeline.submit_download(self.current_names, run)
+
+    def wait_for_downloads(self):
+        """Wait until the pool has finished the downloads this browser started"""
+        with self.downloads_done:
+            self.downloads_done.wait_for(lambda: self.downloads_in_flight == 0)
+
+    def queue_downloads(self, pending):
+        """Start the downloads of a page and leave the waiting to the pipeline's download pool"""
+        for row, row_dict, button, filename in pending:
+            tracker = self.download_tracker
+            if tracker is None:
+                # Without DevTools events a file can't be matched to its click; download in place
+                success, final_filename = self.download_file_from_button(button, filename)
+                self.record_row(self.download_result(row, row_dict, filename, success, final_filename))
+                continue
+
+            before = self.download_watcher.snapshot()
+            self.wait_for_turn()
+            try:
+                self.driver.execute_script("arguments[0].scrollIntoView(true);", button)
+                button.click()
+                logger.info(f"Clicked download button for {filename}")
+            except Exception as e:
+                logger.error(f"Error downloading file: {str(e)}")
+                self.record_row(self.download_result(row, row_dict, filename, False, None))
+                continue
+
+            guid = tracker.wait_for_begin()
+            if guid is None:
+                logger.warning("No DevTools download event received, watching the directory instead")
+                self.metrics.count('retry', 'download_events')
+                self.download_tracker = None
+                success, final_filename = self.finish_download(self.wait_for_download(before), filename)
+                self.record_row(self.download_result(row, row_dict, filename, success, final_filename))
+                continue
+
+            self.submit_download(functools.partial(self.collect_download, tracker, guid, row, row_dict, filename))
+
+    def collect_download(self, tracker, guid, row, row_dict, filename):
+        """Download pool job: wait for a download the browser started and finish its row"""
+        path = tracker.wait_for_completion([guid])[guid]
+        success, final_filename = self.finish_download(path, filename)
+        return self.download_result(row, row_dict, filename, success, final_filename)
+
+    @timed('download_concurrently')
+    def download_concurrently(self, items):
+        """Click several download buttons and wait for the downloads together"""
+        # Each click is matched to the GUID of the download it started, so every
+        # file ends up under its intended filename even when downloads overlap
+        results = []
+        for start in range(0, len(items), self.max_downloads):
+            chunk = items[start:start + self.max_downloads]
+            chunk_results = [None] * len(chunk)
+            tracker = self.download_tracker
+            in_flight = {}  # guid -> position in chunk
+            
+            for i, (button, filename) in enumerate(chunk):
+                if self.download_tracker is None:
+                    # Events stopped arriving; finish the rest one at a time
+                    chunk_results[i] = self.download_file_from_button(button, filename)
+                    continue
+                
+                before = self.download_watcher.snapshot()
+                self.wait_for_turn()
+                try:
+                    self.driver.execute_script("arguments[0].scrollIntoView(true);", button)
+                    button.click()
+                    logger.info(f"Clicked download button for {filename}")
+                except Exception as e:
+                    logger.error(f"Error downloading file: {str(e)}")
+                    chunk_results[i] = (False, None)
+                    continue
+                
+                guid = tracker.wait_for_begin()
+                if guid is None:
+                    logger.warning("No DevTools download event received, watching the directory instead")
+                    self.metrics.count('retry', 'download_events')
+                    self.download_tracker = None
+                    chunk_results[i] = self.finish_download(self.wait_for_download(before), filename)
+                else:
+                    in_flight[guid] = i
+            
+            if in_flight:
+                paths = tracker.wait_for_completion(list(in_flight))
+                for guid, i in in_flight.items():
+                    chunk_results[i] = self.finish_download(paths[guid], chunk[i][1])
+            results.extend(chunk_results)
+        return results
+
+    @timed('process_name_http')
+    def process_name_http(self, name, names=None):
+        """Process a single name through the JSON backend instead of the UI"""
+        names = names or [name]
+        logger.info(f"\nProcessing name (HTTP): {name}")
+        seen = {}
+        order = ListingOrder()
 
-    def random_delay(self):
-        delay = random.uniform(4, 10)  # Increased delay between actions
-        time.sleep(delay)
+        def page_done(page_rows):
+            number_repeats(page_rows, seen)
+            return self.nothing_new(page_rows, names, order)
+
+        rows = self.backend.search_all(name, stop=page_done)
+        if not rows:
+            logger.warning(f"No declarations found for {name}")
+            return
+
+        logger.info(f"Found {len(rows)} declarations for {name}")
+        name_data = []
+        for row in rows:
+            searched = self.searched_names(row, names)
+            if not searched:
+                continue  # another person with the same surname
+            row['searched_name'] = searched
+            if self.is_known(row) or self.row_already_done(row):
+                continue
+            row_dict = dict(row)
+            download_url = row_dict.pop('download_url')
+            if not row['has_download']:
+                logger.warning(f"No download button for {row['name']} on {row['date']}")
+                row_dict['saved_filename'] = 'N/A'
+                row_dict['download_status'] = 'No download button'
+                name_data.append(row_dict)
+                continue
+
+            if self.existing_download(row, row_dict):
+                name_data.append(row_dict)
+                continue
+
+            filename = self.make_filename(row)
+            row_dict['saved_filename'] = filename
+            if self.pipeline is not None:
+                self.submit_download(functools.partial(self.fetch_download_job, download_url, row, row_dict, filename))
+                continue
+            name_data.append(self.fetch_download(download_url, row, row_dict, filename))
+
+        # Only keep the rows once the whole name went through, so a fallback
+        # to the browser does not record them twice
+        for row_dict in name_data:
+            self.record_row(row_dict)
+
+    def fetch_download(self, download_url, row, row_dict, filename):
+        """Download a PDF from the backend and return the row with its download status"""
+        partial_path = os.path.join(self.staging_dir, filename + '.part')
+        try:
+            self.backend.download(download_url, partial_path)
+            final_filename = self.move_to_downloads(partial_path, filename)
+        except CloudflareChallenge:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        except (requests.RequestException, OSError) as e:
+            logger.error(f"Error downloading file: {str(e)}")
+            return self.download_result(row, row_dict, filename, False, None)
+        return self.download_result(row, row_dict, filename, True, final_filename)
+
+    def fetch_download_job(self, download_url, row, row_dict, filename):
+        """Download pool job for the HTTP backend"""
+        try:
+            return self.fetch_download(download_url, row, row_dict, filename)
+        except CloudflareChallenge as e:
+            # The search already went through, so only this file is missed; --resume retries it
+            logger.warning(f"{str(e)} - {filename} will be retried on --resume")
+            return self.download_result(row, row_dict, filename, False, None)
+
+    def random_delay(self, low=4, high=10):
+        """Human-like pause, shortened while the site responds cleanly and stretched after challenges"""
+        with self.metrics.span('delay', range=f"{low}-{high}"):
+            self.pacer.pause(self.base_url, low, high)
+
+    @timed('rate_limit_wait')
+    def wait_for_turn(self):
+        """Wait until the pacer allows the next request to the site"""
+        self.pacer.wait(self.base_url)
 
     def wait_for_element(self, by, value, timeout=20):
         """Wait for an element to be present and visible"""
@@ -177,64 +829,64 @@ class DeclaratiiScraper:
             return element
         except TimeoutException:
             logger.error(f"Timeout waiting for element: {value}")
+            self.metrics.count('timeout', 'wait_for_element')
             return None
 
-    def wait_for_download(self, timeout=30):  # Reduced timeout
-        """Wait for the download to complete and return the downloaded filename"""
-        start_time = time.time()
-        downloads_dir = os.path.abspath("downloads")
-        initial_files = set(f for f in os.listdir(downloads_dir) if f.endswith('.pdf'))
+    def wait_for_elements(self, by, value, timeout=20):
+        """Wait for at least one matching element and return all of them"""
+        try:
+            return WebDriverWait(self.driver, timeout).until(
+                EC.presence_of_all_elements_located((by, value))
+            )
+        except TimeoutException:
+            logger.error(f"Timeout waiting for elements: {value}")
+            self.metrics.count('timeout', 'wait_for_element')
+            return []
+
+    @timed('wait_for_download')
+    def wait_for_download(self, initial_files, timeout=30):  # Reduced timeout
+        """Wait for a download that is not in initial_files to complete and return its path"""
+        return self.download_watcher.wait_for_new_file(initial_files, timeout)
+
+    def finish_download(self, downloaded_file, filename):
+        """Rename a completed download to filename and return (success, final_filename)"""
+        if not downloaded_file:
+            logger.error(f"Download timeout for {filename}")
+            self.metrics.count('timeout', 'download')
+            return False, None
         
-        while time.time() - start_time < timeout:
-            current_files = set(f for f in os.listdir(downloads_dir) if f.endswith('.pdf'))
-            new_files = current_files - initial_files
-            if new_files:
-                # Return the path of the new file
-                return os.path.join(downloads_dir, new_files.pop())
-            time.sleep(0.5)  # Check more frequently
-        return None
+        try:
+            final_filename = self.move_to_downloads(downloaded_file, filename)
+            logger.info(f"Successfully downloaded and renamed to {final_filename}")
+            return True, final_filename
+        except Exception as e:
+            logger.error(f"Error renaming file: {str(e)}")
+            return False, None
 
+    @timed('download_file_from_button')
     def download_file_from_button(self, button, filename):
         """Download file by clicking the download button"""
         try:
-            # Scroll the button into view
+            # Scroll the button into view; scrollIntoView finishes before execute_script returns
             self.driver.execute_script("arguments[0].scrollIntoView(true);", button)
-            time.sleep(2)  # Wait for scroll to complete
+            
+            # Snapshot before clicking so a fast download is not missed
+            initial_files = self.download_watcher.snapshot()
             
             # Click the download button
+            self.wait_for_turn()
             button.click()
             logger.info(f"Clicked download button for {filename}")
             
             # Wait for the download to complete and get the downloaded file path
-            downloaded_file = self.wait_for_download()
-            if downloaded_file:
-                # Handle duplicate filenames
-                base_name = os.path.splitext(filename)[0]
-                extension = os.path.splitext(filename)[1]
-                counter = 1
-                new_path = os.path.join(os.path.dirname(downloaded_file), filename)
-                
-                # If file exists, add a number to the filename
-                while os.path.exists(new_path):
-                    new_path = os.path.join(os.path.dirname(downloaded_file), f"{base_name}_{counter}{extension}")
-                    counter += 1
-                
-                try:
-                    os.rename(downloaded_file, new_path)
-                    final_filename = os.path.basename(new_path)
-                    logger.info(f"Successfully downloaded and renamed to {final_filename}")
-                    return True, final_filename
-                except Exception as e:
-                    logger.error(f"Error renaming file: {str(e)}")
-                    return False, None
-            else:
-                logger.error(f"Download timeout for {filename}")
-                return False, None
+            downloaded_file = self.wait_for_download(initial_files)
+            return self.finish_download(downloaded_file, filename)
                 
         except Exception as e:
             logger.error(f"Error downloading file: {str(e)}")
             return False, None
 
+    @timed('wait_for_cloudflare')
     def wait_for_cloudflare(self, timeout=30):
         """Wait for Cloudflare verification to complete"""
         start_time = time.time()
@@ -245,6 +897,8 @@ class DeclaratiiScraper:
                 # Check if we're on the Cloudflare verification page
                 if "challenge" in self.driver.current_url or "cloudflare" in self.driver.current_url.lower():
                     logger.info("Cloudflare verification detected. Please complete the verification manually.")
+                    self.pacer.on_challenge(self.base_url)
+                    self.metrics.count('challenge', 'wait_for_cloudflare')
                     # Wait for the verification to complete
                     while time.time() - start_time < timeout:
                         if "challenge" not in self.driver.current_url and "cloudflare" not in self.driver.current_url.lower():
@@ -259,93 +913,153 @@ class DeclaratiiScraper:
                 time.sleep(1)
         
         logger.error("Timeout waiting for Cloudflare verification")
+        self.metrics.count('timeout', 'wait_for_cloudflare')
         return False
 
+    def find_first(self, selectors, timeout=20):
+        """Return (element, selector) for the first selector that matches, or (None, None)"""
+        # Check every selector on each pass instead of waiting out each one in turn
+        deadline = time.time() + timeout
+        while True:
+            for by, value in selectors:
+                elements = self.driver.find_elements(by, value)
+                if elements:
+                    return elements[0], (by, value)
+            if time.time() >= deadline:
+                return None, None
+            time.sleep(0.25)
+
+    @timed('load_search_page')
+    def load_search_page(self):
+        """Load the search page from scratch"""
+        logger.info(f"Navigating to {self.base_url}")
+        self.wait_for_turn()
+        self.driver.get(self.base_url)
+        self.random_delay()
+        
+        # Wait for the page to load completely
+        self.wait_for_element(By.TAG_NAME, "body")
+        
+        # Log the current URL and page title for debugging
+        logger.info(f"Current URL: {self.driver.current_url}")
+        logger.info(f"Page title: {self.driver.title}")
+        
+        self.session_loaded = True
+        self.page_size_set = False
+
+    @timed('find_search_form')
+    def find_search_form(self, probe=True):
+        """Return the search input and submit button, reusing the selectors that worked last time"""
+        if self.form_selectors is not None:
+            input_selector, button_selector = self.form_selectors
+            inputs = self.driver.find_elements(*input_selector)
+            buttons = self.driver.find_elements(*button_selector)
+            if inputs and buttons:
+                return inputs[0], buttons[0]
+            if not probe:
+                return None, None
+            logger.info("Search form no longer matches the cached selectors, probing again")
+            self.metrics.count('retry', 'find_search_form')
+            self.form_selectors = None
+        elif not probe:
+            return None, None
+        
+        # Try different possible selectors for the search input
+        search_input, input_selector = self.find_first(SEARCH_INPUT_SELECTORS)
+        if not search_input:
+            logger.error("Could not find search input field")
+            return None, None
+        logger.info(f"Found search input with selector: {input_selector[1]}")
+        
+        # Try different possible selectors for the submit button
+        submit_button, button_selector = self.find_first(SUBMIT_BUTTON_SELECTORS)
+        if not submit_button:
+            logger.error("Could not find submit button")
+            return None, None
+        logger.info(f"Found submit button with selector: {button_selector[1]}")
+        
+        self.form_selectors = (input_selector, button_selector)
+        return search_input, submit_button
+
+    @timed('search_person')
     def search_person(self, name):
         """Search for a person by name"""
         try:
-            logger.info(f"Navigating to {self.base_url}")
-            self.driver.get(self.base_url)
-            self.random_delay()
-            
-            # Wait for the page to load completely
-            self.wait_for_element(By.TAG_NAME, "body")
-            
-            # Log the current URL and page title for debugging
-            logger.info(f"Current URL: {self.driver.current_url}")
-            logger.info(f"Page title: {self.driver.title}")
-            
-            # Try different possible selectors for the search input
-            search_input = None
-            possible_selectors = [
-                (By.ID, "ssidLastName"),  # Primary selector - exact ID match
-                (By.CSS_SELECTOR, "input.form-control[type='text']"),  # Class and type match
-                (By.CSS_SELECTOR, "input[style*='width: 600px']"),  # Style attribute match
-                (By.CSS_SELECTOR, "input[type='text'][maxlength='60']"),  # Type and maxlength match
-                (By.CSS_SELECTOR, "input[type='text']"),  # Generic text input fallback
-            ]
-            
-            for by, value in possible_selectors:
-                try:
-                    search_input = self.wait_for_element(by, value)
-                    if search_input:
-                        logger.info(f"Found search input with selector: {value}")
-                        break
-                except:
-                    continue
+            # In session mode, reuse the page that is already open if its form still matches
+            search_input = submit_button = None
+            if self.keep_session and self.session_loaded:
+                search_input, submit_button = self.find_search_form(probe=False)
+                if search_input:
+                    logger.info("Reusing the open search page")
             
             if not search_input:
-                logger.error("Could not find search input field")
-                return None
+                self.load_search_page()
+                search_input, submit_button = self.find_search_form()
+                if not search_input:
+                    return None
+            
+            # Rows of the previous search, used to tell when the new results arrive
+            old_rows = self.driver.find_elements(By.CSS_SELECTOR, "mat-row")
             
             # Enter the name with human-like typing
             logger.info(f"Entering search term: {name}")
             search_input.clear()
+            # clear() alone doesn't always reach Angular's form model
+            search_input.send_keys(Keys.CONTROL, "a")
+            search_input.send_keys(Keys.DELETE)
             for char in name:
                 search_input.send_keys(char)
-                time.sleep(random.uniform(0.1, 0.3))  # Random delay between keystrokes
+                self.random_delay(0.1, 0.3)  # Random delay between keystrokes
             self.random_delay()
             
-            # Try different possible selectors for the submit button
-            submit_button = None
-            button_selectors = [
-                (By.CSS_SELECTOR, "button.btn.btn-success"),
-                (By.CSS_SELECTOR, "button[class*='btn-success']"),
-                (By.XPATH, "//button[contains(text(), 'Cautare')]"),
-                (By.XPATH, "//button[contains(@class, 'btn-success')]"),
-                (By.CSS_SELECTOR, "button[type='button']"),
-                (By.CSS_SELECTOR, "button.btn")
-            ]
-            
-            for by, value in button_selectors:
-                try:
-                    submit_button = self.wait_for_element(by, value)
-                    if submit_button:
-                        logger.info(f"Found submit button with selector: {value}")
-                        break
-                except:
-                    continue
-            
-            if not submit_button:
-                logger.error("Could not find submit button")
-                return None
-            
             # Submit the form
             logger.info("Clicking submit button")
+            self.wait_for_turn()
             submit_button.click()
             
             # Wait for Cloudflare verification if needed
             if not self.wait_for_cloudflare():
+                self.session_loaded = False
+                if self.headless:
+                    # Cloudflare does not let the headless browser through; keep a visible one from now on
+                    logger.warning("Cloudflare verification failed in headless mode, restarting with a visible browser")
+                    self.headless = False
+                    self.restart_driver()
+                    return self.search_person(name)
                 logger.error("Failed to pass Cloudflare verification")
                 return None
             
+            # Hand the fresh clearance to the HTTP client for later names
+            if self.http_enabled() and not self.backend.ready:
+                try:
+                    self.backend.sync_from_driver(self.driver)
+                except Exception as e:
+                    logger.warning(f"Could not copy browser session to HTTP client: {str(e)}")
+            
+            # Don't read the previous person's rows
+            if old_rows:
+                try:
+                    WebDriverWait(self.driver, 20).until(EC.staleness_of(old_rows[0]))
+                except TimeoutException:
+                    logger.warning("Results table did not refresh after the search")
+                    self.metrics.count('timeout', 'results_refresh')
+            
             # Additional wait after verification
-            time.sleep(5)
+            self.random_delay(2, 5)
             
-            return self.extract_table_data()
+            # Show as many rows per page as the site allows
+            if not self.page_size_set and self.wait_for_element(By.CSS_SELECTOR, "table.mat-mdc-table"):
+                self.set_max_page_size()
+                self.page_size_set = True
+            
+            results = self.extract_table_data()
+            self.pacer.on_success(self.base_url)
+            return results
             
         except Exception as e:
             logger.error(f"Error during search: {str(e)}")
+            # Start from a fresh page next time
+            self.session_loaded = False
             # Take a screenshot for debugging
             try:
                 self.driver.save_screenshot("error_screenshot.png")
@@ -354,6 +1068,35 @@ class DeclaratiiScraper:
                 pass
             return None
             
+    @timed('set_max_page_size')
+    def set_max_page_size(self):
+        """Switch the paginator to its largest page size so fewer page turns are needed"""
+        try:
+            page_size_select = self.driver.find_element(By.CSS_SELECTOR, "mat-paginator mat-select")
+        except NoSuchElementException:
+            return
+        
+        try:
+            page_size_select.click()
+            options = self.wait_for_elements(By.CSS_SELECTOR, "mat-option", timeout=5)
+            if not options:
+                return
+            
+            # Options are listed smallest first
+            largest = max(options, key=lambda option: int(option.text.strip()) if option.text.strip().isdigit() else 0)
+            if largest.get_attribute("aria-selected") == "true":
+                # Already at the largest size; close the dropdown again
+                largest.click()
+                return
+            
+            logger.info(f"Setting page size to {largest.text.strip()}")
+            self.wait_for_turn()
+            largest.click()
+            self.random_delay(1, 3)
+        except Exception as e:
+            logger.warning(f"Could not change page size: {str(e)}")
+
+    @timed('extract_table_data')
     def extract_table_data(self):
         """Extract data from the results table"""
         try:
@@ -362,47 +1105,27 @@ class DeclaratiiScraper:
             if not table:
                 logger.error("Could not find results table")
                 return None
-                
-            self.random_delay()
-            
-            # Parse the table using BeautifulSoup
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            table_data = []
             
-            # Find all rows (mat-row elements)
-            rows = soup.find_all('mat-row')
-            if not rows:
-                logger.warning("No rows found in the table")
-                return None
-                
-            for row in rows:
-                cells = row.find_all('mat-cell')
-                if cells:
-                    # Extract data from each cell
-                    row_data = {
-                        'name': cells[0].text.strip(),
-                        'institution': cells[1].text.strip(),
-                        'position': cells[2].text.strip(),
-                        'city': cells[3].text.strip(),
-                        'county': cells[4].text.strip(),
-                        'date': cells[5].text.strip(),
-                        'declaration_type': cells[6].text.strip()
-                    }
-                    
-                    # Find download button
-                    download_button = cells[7].find('button')
-                    if download_button:
-                        row_data['has_download'] = True
-                    else:
-                        row_data['has_download'] = False
-                    
-                    table_data.append(row_data)
+            # Read only the rows, in one round trip to the browser
+            try:
+                table_data = table_rows_to_records(self.driver.execute_script(TABLE_ROWS_SCRIPT))
+            except WebDriverException as e:
+                logger.warning(f"In-browser extraction failed, parsing page source: {str(e)}")
+                table_data = parse_table_html(self.driver.page_source)
+                rows = [
+                    row for row in self.driver.find_elements(By.CSS_SELECTOR, "mat-row")
+                    if row.find_elements(By.CSS_SELECTOR, "mat-cell")
+                ]
+                for record, row in zip(table_data, rows):
+                    buttons = row.find_elements(By.CSS_SELECTOR, "mat-cell:nth-of-type(8) button")
+                    if buttons:
+                        record['button'] = buttons[0]
                     
             if not table_data:
                 logger.warning("No data extracted from table")
                 return None
                 
-            return pd.DataFrame(table_data)
+            return table_data
             
         except Exception as e:
             logger.error(f"Error extracting table data: {str(e)}")
@@ -410,59 +1133,347 @@ class DeclaratiiScraper:
             
     def close(self):
         """Close the WebDriver"""
+        self.wait_for_downloads()
+        self.download_watcher.stop()
         if hasattr(self, 'driver'):
             self.driver.quit()
 
-def main():
-    # Check if Excel file is provided as argument
-    if len(sys.argv) != 2:
-        logger.error("Please provide the Excel file name as an argument.")
-        logger.error("Usage: python scraper.py <excel_file_name>")
-        return
+def run_worker(worker_id, name_queue, worker_count, scraper_options=None, stop=None):
+    """Process (search term, names) pairs from the shared queue with a dedicated browser until stop is set"""
+    scraper_args = dict(scraper_options or {})
+    if worker_count > 1:
+        # Each worker gets its own Chrome profile and download staging directory
+        scraper_args['staging_dir'] = os.path.join('downloads', f'.worker_{worker_id}')
+        scraper_args['profile_dir'] = os.path.join('profiles', f'worker_{worker_id}')
 
-    excel_file = sys.argv[1]
-    if not os.path.exists(excel_file):
-        logger.error(f"Excel file '{excel_file}' not found.")
+    try:
+        scraper = DeclaratiiScraper(**scraper_args)
+    except Exception as e:
+        logger.error(f"Worker {worker_id} could not start: {str(e)}")
         return
 
-    scraper = DeclaratiiScraper()
     try:
-        # Create downloads directory if it doesn't exist
-        os.makedirs('downloads', exist_ok=True)
-        
-        # Get names from Excel file
-        # excel_file = "Baza de date - Cautare ANI_short.xlsx"
-        names = scraper.get_names_from_excel(excel_file)
-        
-        if not names:
-            logger.error("No names found in Excel file")
-            return
-            
-        # Process each name
-        for name in names:
-            scraper.process_name(name)
+        while stop is None or not stop.is_set():
+            try:
+                name, names = name_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if scraper.state is not None:
+                done = [requested for requested in names if scraper.state.is_name_done(requested)]
+                for requested in done:
+                    logger.info(f"Skipping {requested} - already done in a previous run")
+                names = [requested for requested in names if requested not in done]
+                if not names:
+                    if scraper.work_queue is not None:
+                        scraper.work_queue.complete(done, True)
+                    continue
+                if len(names) == 1:
+                    name = names[0]
+
+            scraper.process_name(name, names)
+            if stop is not None and stop.is_set():
+                break
             # Add a longer delay between different people
-            time.sleep(random.uniform(10, 15))
-        
-        # Save all collected data to Excel
-        if scraper.all_data:
-            df = pd.DataFrame(scraper.all_data)
-            base_output_file = "all_declarations_data.xlsx"
-            
-            # Check if file exists and add timestamp if it does
-            if os.path.exists(base_output_file):
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                output_file = f"all_declarations_data_{timestamp}.xlsx"
-            else:
-                output_file = base_output_file
-                
-            df.to_excel(output_file, index=False)
-            logger.info(f"\nAll data saved to {output_file}")
-        else:
-            logger.warning("No data was collected to save")
-            
+            scraper.random_delay(10, 15)
     finally:
         scraper.close()
 
+
+def run_workers(names, worker_count=1, scraper_options=None, batch_surnames=False, work_queue=None):
+    """Process all names with a pool of independent scrapers"""
+    searches = group_by_surname(names) if batch_surnames else [(name, [name]) for name in names]
+    if batch_surnames:
+        logger.info(f"{len(names)} names grouped into {len(searches)} searches by surname")
+    if work_queue is not None:
+        # Every host adds the same searches; the workers lease them from the shared queue
+        work_queue.add(searches)
+        name_queue = work_queue
+    else:
+        name_queue = queue.Queue()
+        for search in searches:
+            name_queue.put(search)
+
+    if worker_count <= 1:
+        run_worker(1, name_queue, 1, scraper_options)
+        return
+
+    # Only the main thread sees Ctrl-C; the workers finish their current name and quit their
+    # browsers before main() closes the output and state they write to
+    stop = threading.Event()
+    threads = []
+    for worker_id in range(1, worker_count + 1):
+        thread = threading.Thread(
+            target=run_worker,
+            args=(worker_id, name_queue, worker_count, scraper_options, stop),
+            name=f"worker-{worker_id}",
+            daemon=True,  # A second Ctrl-C doesn't wait for them
+        )
+        thread.start()
+        threads.append(thread)
+
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        logger.warning("\nInterrupted - waiting for the workers to finish their current name (Ctrl-C again to quit now)")
+        stop.set()
+        if work_queue is not None:
+            work_queue.interrupt()
+        for thread in threads:
+            thread.join()
+        raise
+
+    if not name_queue.empty():
+        logger.warning(f"{name_queue.qsize()} searches were not processed because all workers stopped")
+
+
+def save_results(all_data):
+    """Save all collected data to Excel"""
+    df = pd.DataFrame(all_data)
+    if df.empty:
+        logger.warning("No data was collected to save")
+        return
+
+    # Check if file exists and add timestamp if it does
+    output_file = timestamped_path("all_declarations_data.xlsx")
+        
+    df.to_excel(output_file, index=False)
+    logger.info(f"\nAll data saved to {output_file}")
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Download asset declarations from declaratii.integritate.eu")
+    parser.add_argument("excel_file", help="Excel file with names in the 'Nume' column")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of browsers processing names in parallel (default: 1)")
+    parser.add_argument("--min-interval", type=float, default=0,
+                        help="Minimum seconds between requests to the site across all workers (default: 0, no extra cap)")
+    parser.add_argument("--pause-scale", type=float, default=1.0,
+                        help="Multiplier for the human-like pauses; 0 disables them (default: 1)")
+    parser.add_argument("--rate-limit", action="append", metavar="HOST=MAX or HOST=MIN:START:MAX",
+                        help="Requests per second allowed for a host; the pacer adapts between MIN and MAX")
+    parser.add_argument("--http", action="store_true",
+                        help="After the first browser search, query the JSON backend directly")
+    parser.add_argument("--state", default="state.sqlite",
+                        help="SQLite file where progress is checkpointed (default: state.sqlite)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip names and declarations already done in the state file")
+    parser.add_argument("--reload-each-name", dest="keep_session", action="store_false",
+                        help="Reload the site for every name instead of reusing the open search page")
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="Site to scrape, e.g. a local mock for benchmarks (default: %(default)s)")
+    parser.add_argument("--max-downloads", type=int, default=3,
+                        help="Downloads from one results page allowed in flight at once (default: 3)")
+    parser.add_argument("--output",
+                        help="Output file (CSV) or directory (Parquet) that rows are appended to as they are processed "
+                             "(default: all_declarations_data.csv or all_declarations_data.parquet)")
+    parser.add_argument("--format", choices=FORMATS, default="csv",
+                        help="Output format (default: csv)")
+    parser.add_argument("--no-excel", dest="excel", action="store_false",
+                        help="Don't export the output to an Excel file at the end of the run")
+    parser.add_argument("--report", default="run_report.json",
+                        help="JSON file with per-phase timings written at the end of the run (default: run_report.json)")
+    parser.add_argument("--prometheus", default="run_metrics.prom",
+                        help="Prometheus textfile with the same metrics (default: run_metrics.prom)")
+    parser.add_argument("--trace",
+                        help="Also append every timing span, tagged with name and page, to this JSON-lines file")
+    parser.add_argument("--redownload", action="store_true",
+                        help="Download declarations again even if the manifest says they are on disk")
+    parser.add_argument("--batch-surnames", action="store_true",
+                        help="Search a surname shared by several names once and split the rows between them")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Finish downloads in a separate pool and save rows in a writer thread, "
+                             "so the browsers go on searching while files download")
+    parser.add_argument("--download-workers", type=int, default=4,
+                        help="Threads in the pipeline's download pool (default: 4)")
+    parser.add_argument("--download-queue", type=int, default=20,
+                        help="Downloads allowed to wait for the pool before the browsers pause (default: 20)")
+    parser.add_argument("--write-queue", type=int, default=500,
+                        help="Rows allowed to wait for the writer before the other stages pause (default: 500)")
+    parser.add_argument("--since-last-run", nargs="*", metavar="FILE",
+                        help="Skip declarations found in earlier output files and stop paging at the first page "
+                             "without new ones; with no FILE, all all_declarations_data* files here are used")
+    parser.add_argument("--lean", action="store_true",
+                        help="Headless browser with a small window that doesn't load images, fonts, media or analytics")
+    parser.add_argument("--recycle-after", type=int, default=0, metavar="N",
+                        help="Restart each browser after N names (default: 0, never)")
+    parser.add_argument("--max-browser-mb", type=float, default=0, metavar="MB",
+                        help="Restart a browser once it uses more than MB of memory (default: 0, no limit)")
+    parser.add_argument("--queue", metavar="FILE",
+                        help="SQLite work queue shared by several hosts; each host leases searches from it "
+                             "instead of working through the whole list")
+    parser.add_argument("--host-id",
+                        help="Name this host holds its leases under (default: hostname and process id)")
+    parser.add_argument("--lease", type=float, default=120, metavar="SECONDS",
+                        help="How long a lease lasts without a heartbeat before other hosts take the search over "
+                             "(default: 120)")
+    parser.add_argument("--run-dir", metavar="DIR",
+                        help="Write the state, output, reports and downloads of this run under DIR")
+    parser.add_argument("--local-hosts", type=int, default=0, metavar="N",
+                        help="Run N scraper processes on this machine as if they were separate hosts, sharing "
+                             "one work queue, then merge their runs here")
+    return parser.parse_args(argv)
+
+
+def run_local_hosts(argv, args):
+    """Run several scraper processes on one work queue, each in its own run directory, and merge their runs"""
+    queue_path = os.path.abspath(args.queue or 'work_queue.sqlite')
+    # Like the state file, the queue starts over unless the run is resumed
+    if not args.resume and os.path.exists(queue_path):
+        os.remove(queue_path)
+
+    host_argv = []
+    skip_value = False
+    for arg in argv:
+        if skip_value:
+            skip_value = False
+        elif arg == '--local-hosts':
+            skip_value = True
+        elif not arg.startswith('--local-hosts='):
+            host_argv.append(arg)
+
+    run_dirs = [os.path.join('hosts', f'host_{i}') for i in range(1, args.local_hosts + 1)]
+    processes = []
+    for i, run_dir in enumerate(run_dirs, start=1):
+        command = [sys.executable, os.path.abspath(__file__)] + host_argv + [
+            '--queue', queue_path, '--run-dir', run_dir, '--host-id', f'local-{i}',
+        ]
+        logger.info(f"Starting host local-{i} in {run_dir}")
+        processes.append(subprocess.Popen(command))
+
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        # The hosts got the Ctrl-C too; let them hand back their leases
+        logger.warning("\nInterrupted - waiting for the hosts to stop")
+        for process in processes:
+            process.wait()
+
+    failed = [f"local-{i}" for i, process in enumerate(processes, start=1) if process.returncode]
+    if failed:
+        logger.warning(f"Hosts that exited with an error: {', '.join(failed)}")
+
+    output_path = merge_runs(run_dirs, '.', args.format)
+    logger.info(f"Runs of {len(run_dirs)} hosts merged into {output_path}")
+    if args.excel:
+        save_results(read_output(output_path))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.local_hosts:
+        run_local_hosts(sys.argv[1:] if argv is None else argv, args)
+        return
+
+    excel_file = args.excel_file
+    if not os.path.exists(excel_file):
+        logger.error(f"Excel file '{excel_file}' not found.")
+        return
+
+    if args.max_browser_mb and psutil is None and not os.path.isdir('/proc'):
+        logger.warning("--max-browser-mb has no effect: the browser's memory can't be measured "
+                       "without psutil on this system (pip install psutil)")
+
+    if args.run_dir:
+        # Files given on the command line stay relative to where the run was started
+        excel_file = os.path.abspath(excel_file)
+        if args.since_last_run is not None:
+            args.since_last_run = [os.path.abspath(path) for path in args.since_last_run or find_previous_outputs()]
+        if args.queue:
+            args.queue = os.path.abspath(args.queue)
+        os.makedirs(args.run_dir, exist_ok=True)
+        os.chdir(args.run_dir)
+
+    # Create downloads directory if it doesn't exist
+    os.makedirs('downloads', exist_ok=True)
+    
+    # Get names from Excel file
+    # excel_file = "Baza de date - Cautare ANI_short.xlsx"
+    names = get_names_from_excel(excel_file)
+    
+    if not names:
+        logger.error("No names found in Excel file")
+        return
+
+    known = None
+    if args.since_last_run is not None:
+        # Read before this run's output file is created
+        known = KnownDeclarations()
+        known.load(args.since_last_run or find_previous_outputs())
+
+    state = StateStore(args.state, resume=args.resume)
+    download_index = None if args.redownload else DownloadIndex('downloads')
+    host_limits = parse_host_limits(args.rate_limit)
+    if args.min_interval > 0:
+        limits = host_limits.setdefault(host_of(args.base_url), {})
+        limits['max_rate'] = min(limits.get('max_rate', 1 / args.min_interval), 1 / args.min_interval)
+        limits['rate'] = min(limits.get('rate', limits['max_rate']), limits['max_rate'])
+    pacer = Pacer(host_limits, pause_scale=args.pause_scale)
+
+    # A resumed run keeps appending to the output file of the interrupted one
+    output_path = state.get_meta('output_path') if args.resume else None
+    if output_path is None:
+        output_path = timestamped_path(args.output or f"all_declarations_data.{args.format}")
+        state.set_meta('output_path', output_path)
+    output_format = 'parquet' if output_path.endswith('.parquet') else args.format
+    # Rows are checkpointed only after they reach the output, so --resume never skips a lost row
+    output = OutputSink(output_path, output_format, on_write=state.record_rows)
+    logger.info(f"Writing rows to {output_path}")
+
+    work_queue = None
+    if args.queue:
+        work_queue = WorkQueue(args.queue, args.host_id, lease_seconds=args.lease)
+        logger.info(f"Leasing searches from {args.queue} as {work_queue.host_id}")
+
+    metrics = Metrics(args.trace)
+    pipeline = None
+    if args.pipeline:
+        pipeline = Pipeline(output, state, metrics, download_workers=args.download_workers,
+                            download_queue_size=args.download_queue, write_queue_size=args.write_queue,
+                            work_queue=work_queue)
+
+    scraper_options = {
+        'metrics': metrics,
+        'output': output,
+        'pacer': pacer,
+        'use_http': args.http,
+        'state': state,
+        'download_index': download_index,
+        'max_downloads': args.max_downloads,
+        'keep_session': args.keep_session,
+        'base_url': args.base_url,
+        'lean': args.lean,
+        'recycle_after': args.recycle_after,
+        'max_browser_mb': args.max_browser_mb,
+        'pipeline': pipeline,
+        'known': known,
+        'work_queue': work_queue,
+    }
+    try:
+        run_workers(names, args.workers, scraper_options, args.batch_surnames, work_queue)
+    except KeyboardInterrupt:
+        logger.warning(f"\nInterrupted - progress is saved in {args.state}, rerun with --resume to continue")
+
+    if pipeline is not None:
+        pipeline.close()
+    if work_queue is not None:
+        work_queue.close()
+    pacer.report()
+    output.close()
+    metrics.write_json(args.report)
+    metrics.write_prometheus(args.prometheus)
+    metrics.close()
+
+    # The output file holds the rows of this run, including those from before a resume
+    if args.excel:
+        save_results(output.read_dataframe())
+    state.close()
+    if download_index is not None:
+        download_index.close()
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
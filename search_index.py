@@ -0,0 +1,269 @@
+"""Full-text search over the downloaded declaration PDFs
+
+`index` extracts the text of every PDF in downloads/ into an SQLite FTS5
+index and links each file to its row in the scraper's output through
+saved_filename. Only new or changed files are read on later runs.
+`search` queries the index and prints the matching declarations with
+snippets.
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from known_declarations import NO_FILE, find_previous_outputs, read_output
+
+logger = logging.getLogger(__name__)
+
+# Row fields shown with each match
+LINKED_COLUMNS = ('name', 'institution', 'position', 'date', 'declaration_type')
+
+
+def extract_text(path):
+    """Text of every page of a PDF; runs in a worker process and returns (text, error)"""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        raise ImportError("Indexing PDFs needs pypdfium2: pip install pypdfium2")
+
+    try:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            pages = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+    except Exception as e:
+        return '', str(e)
+    return '\n'.join(pages), None
+
+
+class SearchIndex:
+    """SQLite FTS5 index of the PDF texts, with the output rows they belong to"""
+
+    def __init__(self, path="search_index.sqlite"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                filename TEXT UNIQUE NOT NULL,
+                size INTEGER,
+                mtime REAL,
+                error TEXT,
+                indexed_at TEXT
+            );
+            -- remove_diacritics lets 'Petrosani' find 'Petroşani'
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+                text, tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS declarations (
+                saved_filename TEXT PRIMARY KEY,
+                {', '.join(f'{column} TEXT' for column in LINKED_COLUMNS)}
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                mtime REAL
+            );
+        """)
+        self.conn.commit()
+
+    def changed_files(self, download_dir):
+        """PDFs that are new or changed since they were indexed, and filenames that are gone"""
+        indexed = {
+            filename: (size, mtime)
+            for filename, size, mtime in self.conn.execute("SELECT filename, size, mtime FROM files")
+        }
+        changed = []
+        present = set()
+        for filename in sorted(os.listdir(download_dir)):
+            path = os.path.join(download_dir, filename)
+            if not filename.lower().endswith('.pdf') or not os.path.isfile(path):
+                continue
+            present.add(filename)
+            stat = os.stat(path)
+            if indexed.get(filename) != (stat.st_size, stat.st_mtime):
+                changed.append((path, stat.st_size, stat.st_mtime))
+        return changed, set(indexed) - present
+
+    def store(self, filename, size, mtime, text, error):
+        """Add or replace the text of a file"""
+        row = self.conn.execute("SELECT id FROM files WHERE filename = ?", (filename,)).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+        self.conn.execute(
+            "INSERT INTO files (filename, size, mtime, error, indexed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(filename) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+            "error = excluded.error, indexed_at = excluded.indexed_at",
+            (filename, size, mtime, error, time.strftime("%Y-%m-%dT%H:%M:%S")),
+        )
+        file_id = self.conn.execute("SELECT id FROM files WHERE filename = ?", (filename,)).fetchone()[0]
+        self.conn.execute("INSERT INTO documents (rowid, text) VALUES (?, ?)", (file_id, text))
+
+    def remove(self, filenames):
+        for filename in filenames:
+            row = self.conn.execute("SELECT id FROM files WHERE filename = ?", (filename,)).fetchone()
+            if row:
+                self.conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+                self.conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+        self.conn.commit()
+
+    def index_files(self, download_dir, workers=None, commit_every=200):
+        """Extract and index the text of new or changed PDFs; returns the number of files read"""
+        changed, removed = self.changed_files(download_dir)
+        if removed:
+            logger.info(f"Removing {len(removed)} deleted files from the index")
+            self.remove(removed)
+        if not changed:
+            return 0
+        logger.info(f"Indexing {len(changed)} PDFs with {workers or os.cpu_count()} processes")
+
+        failed = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(extract_text, path): (path, size, mtime) for path, size, mtime in changed}
+            for count, future in enumerate(as_completed(futures), start=1):
+                path, size, mtime = futures[future]
+                text, error = future.result()
+                if error:
+                    failed += 1
+                    logger.warning(f"Could not read {os.path.basename(path)}: {error}")
+                self.store(os.path.basename(path), size, mtime, text, error)
+                if count % commit_every == 0 or count == len(futures):
+                    self.conn.commit()
+                    logger.info(f"Indexed {count}/{len(futures)} PDFs")
+
+        if failed:
+            logger.warning(f"{failed} PDFs could not be read")
+        return len(changed)
+
+    def link_outputs(self, paths):
+        """Load the rows of output files that changed since the last time, keyed by saved_filename"""
+        for path in paths:
+            mtime = os.path.getmtime(path)
+            seen = self.conn.execute("SELECT mtime FROM sources WHERE path = ?", (path,)).fetchone()
+            if seen and seen[0] == mtime:
+                continue
+            try:
+                df = read_output(path)
+            except Exception as e:
+                logger.warning(f"Could not read output {path}: {str(e)}")
+                continue
+            if 'saved_filename' not in df.columns:
+                logger.warning(f"Skipping {path}: no saved_filename column")
+                continue
+
+            rows = []
+            for row in df.to_dict('records'):
+                if row['saved_filename'] not in NO_FILE:
+                    rows.append((row['saved_filename'],) + tuple(str(row.get(column, '')) for column in LINKED_COLUMNS))
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO declarations (saved_filename, {', '.join(LINKED_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(LINKED_COLUMNS) + 1))})",
+                rows,
+            )
+            self.conn.execute("INSERT OR REPLACE INTO sources (path, mtime) VALUES (?, ?)", (path, mtime))
+            self.conn.commit()
+            logger.info(f"Linked {len(rows)} rows from {path}")
+
+    def search(self, query, limit=20):
+        """Return matches for an FTS5 query, best first, as dicts with a snippet"""
+        cursor = self.conn.execute(
+            f"""
+            SELECT files.filename, snippet(documents, 0, '[', ']', '...', 12),
+                   {', '.join(f'declarations.{column}' for column in LINKED_COLUMNS)}
+            FROM documents
+            JOIN files ON files.id = documents.rowid
+            LEFT JOIN declarations ON declarations.saved_filename = files.filename
+            WHERE documents MATCH ?
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (query, limit),
+        )
+        return [
+            dict(zip(('saved_filename', 'snippet') + LINKED_COLUMNS, row))
+            for row in cursor.fetchall()
+        ]
+
+    def close(self):
+        self.conn.close()
+
+
+def run_index(args, index):
+    outputs = args.outputs if args.outputs is not None else find_previous_outputs()
+    while True:
+        index.index_files(args.download_dir, args.workers)
+        index.link_outputs(outputs)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+        if args.outputs is None:
+            outputs = find_previous_outputs()
+
+
+def run_search(args, index):
+    start = time.perf_counter()
+    try:
+        matches = index.search(args.query, args.limit)
+    except sqlite3.OperationalError as e:
+        logger.error(f"Invalid query '{args.query}': {str(e)}")
+        return 1
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for match in matches:
+        who = ', '.join(match[column] for column in LINKED_COLUMNS if match[column])
+        print(match['saved_filename'])
+        if who:
+            print(f"  {who}")
+        print(f"  {' '.join(match['snippet'].split())}")
+    print(f"{len(matches)} matches in {elapsed_ms:.1f} ms")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search over the downloaded declarations")
+    parser.add_argument("--index", default="search_index.sqlite",
+                        help="SQLite file holding the index (default: search_index.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser("index", help="Index new and changed PDFs")
+    index_parser.add_argument("download_dir", nargs="?", default="downloads",
+                              help="Directory with the downloaded PDFs (default: downloads)")
+    index_parser.add_argument("--outputs", nargs="*", metavar="FILE",
+                              help="Output files whose rows are linked to the PDFs by saved_filename "
+                                   "(default: every all_declarations_data* file here)")
+    index_parser.add_argument("--workers", type=int, default=None,
+                              help="Text extraction processes (default: one per CPU core)")
+    index_parser.add_argument("--watch", type=float, default=0, metavar="SECONDS",
+                              help="Keep running and index new downloads every SECONDS")
+
+    search_parser = commands.add_parser("search", help="Find declarations mentioning words or phrases")
+    search_parser.add_argument("query", help='FTS5 query, e.g. \'"Banca Transilvania"\' or \'teren AND Iasi\'')
+    search_parser.add_argument("--limit", type=int, default=20, help="Maximum number of matches (default: 20)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    index = SearchIndex(args.index)
+    try:
+        if args.command == "index":
+            run_index(args, index)
+        else:
+            return run_search(args, index)
+    except KeyboardInterrupt:
+        logger.info("Indexing interrupted")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from download_index import row_identity
+
+logger = logging.getLogger(__name__)
+
+# Download statuses that don't need another attempt
+DONE_STATUSES = ('Success', 'Already downloaded', 'No download button')
+
+
+class StateStore:
+    """Durable record of processed names and declaration rows for resumable runs"""
+
+    def __init__(self, path="state.sqlite", resume=False):
+        self.path = path
+        self.resume = resume
+        # One connection shared by all workers, serialized with a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [column[1] for column in self.conn.execute("PRAGMA table_info(declarations)")]
+        if columns and 'identity' not in columns:
+            # State files from before declarations were keyed like the manifest start over
+            with self.conn:
+                self.conn.execute("DROP TABLE declarations")
+                self.conn.execute("DELETE FROM names")
+            logger.warning(f"{path} uses an older layout and was cleared")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS names (
+                name TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS declarations (
+                identity TEXT PRIMARY KEY,
+                download_status TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+        """)
+        if not resume:
+            # A fresh run starts from an empty state
+            with self.conn:
+                self.conn.execute("DELETE FROM names")
+                self.conn.execute("DELETE FROM declarations")
+                self.conn.execute("DELETE FROM meta")
+        else:
+            done = self.conn.execute("SELECT COUNT(*) FROM names WHERE status = 'done'").fetchone()[0]
+            rows = self.conn.execute("SELECT COUNT(*) FROM declarations").fetchone()[0]
+            logger.info(f"Resuming from {path}: {done} names done, {rows} declarations recorded")
+
+    def get_meta(self, key):
+        """Return a run setting saved with set_meta, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        """Save a run setting, such as the output path, for a later --resume"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def mark_name(self, name, status):
+        """Record the status of a name ('in_progress', 'done' or 'failed')"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO names (name, status, updated_at) VALUES (?, ?, ?)",
+                (name, status, time.time()),
+            )
+
+    def is_name_done(self, name):
+        """Return True if resuming and the name was fully processed before"""
+        if not self.resume:
+            return False
+        with self.lock:
+            row = self.conn.execute("SELECT status FROM names WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == 'done'
+
+    def record_row(self, row_dict):
+        """Store a declaration row as soon as it is handled"""
+        self.record_rows([row_dict])
+
+    def record_rows(self, rows):
+        """Store declaration rows once they are saved, e.g. as an OutputSink's on_write"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO declarations (identity, download_status, data, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        row_identity(row_dict),
+                        row_dict.get('download_status'),
+                        json.dumps(row_dict, ensure_ascii=False, default=str),
+                        now,
+                    )
+                    for row_dict in rows
+                ],
+            )
+
+    def is_row_done(self, row):
+        """Return True if resuming and the declaration row needs no more work"""
+        if not self.resume:
+            return False
+        with self.lock:
+            found = self.conn.execute(
+                "SELECT download_status FROM declarations WHERE identity = ?",
+                (row_identity(row),),
+            ).fetchone()
+        return found is not None and found[0] in DONE_STATUSES
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def default_host_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """Searches shared by several hosts through one SQLite file, handed out under expiring leases"""
+
+    def __init__(self, path, host_id=None, lease_seconds=120, max_attempts=3, poll_interval=10):
+        self.path = path
+        self.host_id = host_id or default_host_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.leases = {}  # name -> id of the search this host leased it with
+        self.lock = threading.Lock()
+        # Transactions are opened by hand so a claim can take the write lock up front
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        # No WAL: its shared memory index doesn't work when the file sits on a network share
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS searches (
+                id INTEGER PRIMARY KEY,
+                names TEXT UNIQUE NOT NULL,
+                term TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                host TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS searches_status ON searches (status, lease_expires);
+        """)
+
+        # Leases of a live host are renewed in the background; a crashed host stops renewing
+        # and its searches go back to the pool once the lease expires
+        self.stopped = threading.Event()
+        # Set on Ctrl-C so idle workers stop waiting for other hosts' leases
+        self.interrupted = threading.Event()
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True)
+        self.heartbeat_thread.start()
+
+    def _transaction(self, statements):
+        """Run statements(conn) in one write transaction and return its result"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        return result
+
+    def add(self, searches):
+        """Add (search term, names) pairs; searches already in the queue are left as they are"""
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO searches (names, term, updated_at) VALUES (?, ?, ?)",
+                [(json.dumps(list(names), ensure_ascii=False), term, time.time()) for term, names in searches],
+            )
+            return conn.total_changes - before
+
+        added = self._transaction(insert)
+        logger.info(f"{added} of {len(searches)} searches added to the work queue {self.path}")
+
+    def claim(self):
+        """Lease the next free search as (term, names), or return None if none is free right now"""
+        def take(conn):
+            now = time.time()
+            # A search whose hosts kept dying with it is given up on
+            conn.execute(
+                "UPDATE searches SET status = 'failed', host = NULL, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, term, names, status, host FROM searches "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE searches SET status = 'leased', host = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                (self.host_id, now + self.lease_seconds, now, row[0]),
+            )
+            return row
+
+        row = self._transaction(take)
+        if row is None:
+            return None
+        search_id, term, names, status, host = row
+        if status == 'leased':
+            logger.warning(f"Taking over '{term}' from {host}, whose lease expired")
+        names = json.loads(names)
+        with self.lock:
+            for name in names:
+                self.leases[name] = search_id
+        return term, names
+
+    def get_nowait(self):
+        """Lease the next search as (term, names); raises queue.Empty once there is nothing left to do"""
+        while not self.interrupted.is_set():
+            claimed = self.claim()
+            if claimed is not None:
+                return claimed
+            # Searches leased by other hosts come back if those hosts crash
+            if not self.count('leased'):
+                break
+            self.interrupted.wait(self.poll_interval)
+        raise queue.Empty
+
+    def interrupt(self):
+        """Make get_nowait give up instead of waiting for other hosts"""
+        self.interrupted.set()
+
+    def complete(self, names, success):
+        """Finish the leases of names; a failed search goes back to the pool until it runs out of attempts"""
+        with self.lock:
+            search_ids = {self.leases.pop(name) for name in names if name in self.leases}
+        for search_id in search_ids:
+            def finish(conn):
+                now = time.time()
+                if success:
+                    status = "'done'"
+                else:
+                    status = f"CASE WHEN attempts >= {int(self.max_attempts)} THEN 'failed' ELSE 'pending' END"
+                return conn.execute(
+                    f"UPDATE searches SET status = {status}, host = NULL, lease_expires = NULL, updated_at = ? "
+                    "WHERE id = ? AND host = ? AND status = 'leased'",
+                    (now, search_id, self.host_id),
+                ).rowcount
+
+            if not self._transaction(finish):
+                # The lease ran out and another host took the search; the merge drops the duplicate rows
+                logger.warning(f"Lease on search {search_id} was lost before it finished")
+
+    def _heartbeat_loop(self):
+        interval = self.lease_seconds / 4
+        while not self.stopped.wait(interval):
+            try:
+                self._transaction(lambda conn: conn.execute(
+                    "UPDATE searches SET lease_expires = ? WHERE host = ? AND status = 'leased'",
+                    (time.time() + self.lease_seconds, self.host_id),
+                ))
+            except sqlite3.Error as e:
+                logger.warning(f"Could not renew leases in {self.path}: {str(e)}")
+
+    def count(self, status):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM searches WHERE status = ?", (status,)).fetchone()[0]
+
+    def qsize(self):
+        return self.count('pending')
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def close(self):
+        """Stop renewing leases and hand unfinished searches back to the other hosts"""
+        self.interrupted.set()
+        self.stopped.set()
+        self.heartbeat_thread.join()
+        released = self._transaction(lambda conn: conn.execute(
+            "UPDATE searches SET status = 'pending', host = NULL, lease_expires = NULL, attempts = attempts - 1, "
+            "updated_at = ? WHERE host = ? AND status = 'leased'",
+            (time.time(), self.host_id),
+        ).rowcount)
+        if released:
+            logger.info(f"Released {released} unfinished searches back to the work queue")
+        counts = {status: self.count(status) for status in ('done', 'failed', 'leased', 'pending')}
+        logger.info("Work queue: " + ", ".join(f"{count} {status}" for status, count in counts.items()))
+        with self.lock:
+            self.conn.close()